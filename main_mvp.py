@@ -3,7 +3,13 @@ from datetime import datetime, date
 import quantstats as qs
 import streamlit.components.v1 as components
 from modules import qs_functions as qsf
-import time
+from modules.analytics_context import AnalyticsContext
+from modules.date_index import slice_dates
+from modules.market_data import fetch_returns
+from modules.memo import fingerprint
+from modules.preload import REPORT_DAYS, start_preload
+from modules.render import render_options
+from modules.rolling import ROLLING_WINDOW, ROLLING_WINDOWS
 from st_aggrid import AgGrid
 from datetime import timedelta
 
@@ -12,6 +18,9 @@ qs.extend_pandas()
 
 st.set_page_config(page_title='MarketMomentum', layout='wide', page_icon=':🎰:')
 
+# Warm the shared cache with the watchlist before users ask for it, once per process
+start_preload()
+
 # Initialize session_state if it doesn't exist
 if 'page' not in st.session_state:
     st.session_state['page'] = 'Home'
@@ -42,7 +51,7 @@ st.sidebar.title('Dates')
 
 # Add a date input widget in the sidebar
 current_date = date.today()
-default_start_date = current_date - timedelta(days=5*365)  # set default start date to 5 years ago
+default_start_date = current_date - timedelta(days=REPORT_DAYS)  # set default start date to 5 years ago
 earliest_date = datetime.strptime('1987-01-01', '%Y-%m-%d').date()  # set selectable date range to start from 1/1/1987
 start_date = st.sidebar.date_input('Start date', default_start_date, min_value=earliest_date, max_value=current_date)
 end_date = st.sidebar.date_input('End date', current_date, min_value=start_date, max_value=current_date)
@@ -62,45 +71,43 @@ if st.sidebar.button('Snapshot'):
 if st.sidebar.button('Custom Report'):
     st.session_state['page'] = 'Custom Report'
 
-# Define start_str and end_str
-start_str = start_date.strftime('%Y-%m-%d')
-end_str = end_date.strftime('%Y-%m-%d')
-
 try:
-    # fetch the daily returns for a stock
-    if 'stock' not in st.session_state or 'symbol' not in st.session_state or st.session_state['symbol'] != symbol:
-        st.session_state['stock'] = qs.utils.download_returns(symbol)
-        if st.session_state['stock'].empty:
-            st.error(f"Ticker {symbol} does not exist.")
-            st.stop()
-        st.session_state['symbol'] = symbol
+    # fetch the daily returns for the stock and the benchmark at the same time
+    stock, benchmarks = fetch_returns(symbol, [benchmark_symbol] if benchmark_symbol else [])
+    if stock.empty:
+        st.error(f"Ticker {symbol} does not exist.")
+        st.stop()
 
-    time.sleep(.5)
-    # If a benchmark symbol is provided, download the returns for the benchmark
+    # If a benchmark symbol is provided, use the returns loaded for the benchmark
     if benchmark_symbol:
-        benchmark = qs.utils.download_returns(benchmark_symbol)
+        benchmark = benchmarks[0]
         if benchmark.empty:
             st.error(f"Benchmark ticker {benchmark_symbol} does not exist.")
             st.stop()
 
         # Filter the benchmark for the selected date range
-        benchmark = benchmark.loc[start_str:end_str]
+        benchmark = slice_dates(benchmark, start_date, end_date)
 
         # Check if the benchmark DataFrame is empty
         if benchmark.empty:
             st.error(f"No data for benchmark {benchmark_symbol} in the specified date range.")
             st.stop()
 
-    stock = st.session_state['stock']
     # Filter the returns for the selected date range
-    stock = stock.loc[start_str:end_str]
-    # Reconstruct the price data from the returns
-    price = (1 + stock).cumprod()
+    stock = slice_dates(stock, start_date, end_date)
 
     # Check if the returns DataFrame is empty
     if stock.empty:
         st.error(f"No data for stock {symbol} in the specified date range.")
         st.stop()
+
+    # Build the shared analytics once per symbol, benchmark and date range and
+    # keep it across reruns, so every graph and table reuses its intermediates
+    context_key = (symbol, fingerprint(stock), benchmark_symbol, fingerprint(benchmark))
+    if st.session_state.get('context_key') != context_key:
+        st.session_state['context'] = AnalyticsContext(stock, symbol, benchmark, benchmark_symbol)
+        st.session_state['context_key'] = context_key
+    context = st.session_state['context']
 except IndexError as e:
     st.error(f"An IndexError occurred: {e}")
     st.stop()
@@ -110,37 +117,55 @@ except Exception as e:
 
 if st.session_state['page'] == 'Custom Report':
     # Define the options for the multi-select dropdown menu
-    options = ['Metrics Table', 'Daily Returns Graph', 'Daily Returns Table (%)', 'Daily Returns Distribution Graph', 'Drawdown Graph', 'Drawdowns Periods Graph', 'Drawdowns Periods Table', 'Earnings Graph', 'Daily Earnings Table (%)', 'Monthly Earnings Table (%)','Yearly Earnings Table (%)','Monthly Distribution Graph',  'Log Returns Graph', 'Monthly Heatmap Graph', 'Monthly Returns Graph', 'Monthly Returns Table (%)', 'Rolling Sharpe Graph', 'Rolling Sharpe Table', 'Rolling Sortino Graph', 'Rolling Sortino Table', 'Rolling Volatility Graph', 'Rolling Volatility Table', 'Yearly Returns Graph', 'Yearly Returns Table (%)']
+    options = ['Metrics Table', 'Daily Returns Graph', 'Daily Returns Table (%)', 'Daily Returns Distribution Graph', 'Drawdown Graph', 'Drawdowns Periods Graph', 'Drawdowns Periods Table', 'Earnings Graph', 'Daily Earnings Table (%)', 'Monthly Earnings Table (%)','Yearly Earnings Table (%)','Monthly Distribution Graph',  'Log Returns Graph', 'Monthly Heatmap Graph', 'Monthly Returns Graph', 'Monthly Returns Table (%)', 'Rolling Sharpe Graph', 'Rolling Sharpe Table', 'Rolling Sortino Graph', 'Rolling Sortino Table', 'Rolling Volatility Graph', 'Rolling Volatility Table', 'Rolling Beta Graph', 'Rolling Beta Table', 'Rolling Alpha Graph', 'Rolling Alpha Table', 'Rolling Correlation Graph', 'Rolling Correlation Table', 'Rolling Tracking Error Graph', 'Rolling Tracking Error Table', 'Yearly Returns Graph', 'Yearly Returns Table (%)']
     selected_options = st.sidebar.multiselect('Select the graphs and tables you want to display:', options)
+
+    # Let the rolling graphs and tables show several windows, all computed together
+    windows = (ROLLING_WINDOW,)
+    if any(option.startswith('Rolling') for option in selected_options):
+        window_labels = st.sidebar.multiselect('Rolling windows', list(ROLLING_WINDOWS), default=['6 months'])
+        windows = tuple(sorted(ROLLING_WINDOWS[label] for label in window_labels)) or windows
+
+    # Options that only have a result against a benchmark
+    benchmark_options = ['Rolling Beta Graph', 'Rolling Beta Table', 'Rolling Alpha Graph', 'Rolling Alpha Table', 'Rolling Correlation Graph', 'Rolling Correlation Table', 'Rolling Tracking Error Graph', 'Rolling Tracking Error Table']
+
     # Modify the function mappings to pass the benchmark to the functions
     graph_functions = {
                 'Daily Returns Graph': lambda stock: qsf.plot_daily_returns(stock, symbol, benchmark, benchmark_symbol),
                 'Daily Returns Distribution Graph': lambda stock: qsf.plot_distribution(stock, symbol, benchmark, benchmark_symbol),
-                'Drawdown Graph': qsf.plot_drawdown,
-                'Drawdowns Periods Graph': qsf.plot_drawdowns_periods,
-                'Earnings Graph': lambda stock: qsf.plot_earnings(stock, symbol, benchmark, benchmark_symbol),
-                'Monthly Distribution Graph': qsf.plot_monthly_dist,
-                'Log Returns Graph': lambda stock: qsf.plot_log_returns(stock, symbol, benchmark, benchmark_symbol),
-                'Monthly Heatmap Graph': qsf.plot_monthly_heatmap,
-                'Monthly Returns Graph': lambda stock: qsf.plot_returns(stock, symbol, benchmark, benchmark_symbol),
-                'Rolling Sharpe Graph': lambda stock: qsf.plot_rolling_sharpe(stock, symbol, benchmark, benchmark_symbol),
-                'Rolling Sortino Graph': lambda stock: qsf.plot_rolling_sortino(stock, symbol, benchmark, benchmark_symbol),
-                'Rolling Volatility Graph': lambda stock: qsf.plot_rolling_volatility(stock, symbol, benchmark, benchmark_symbol),
-                'Yearly Returns Graph': lambda stock: qsf.plot_yearly_returns(stock, symbol, benchmark, benchmark_symbol)
+                'Drawdown Graph': lambda stock: qsf.plot_drawdown(stock, context),
+                'Drawdowns Periods Graph': lambda stock: qsf.plot_drawdowns_periods(stock, context),
+                'Earnings Graph': lambda stock: qsf.plot_earnings(stock, symbol, benchmark, benchmark_symbol, context),
+                'Monthly Distribution Graph': lambda stock: qsf.plot_monthly_dist(stock, context),
+                'Log Returns Graph': lambda stock: qsf.plot_log_returns(stock, symbol, benchmark, benchmark_symbol, context),
+                'Monthly Heatmap Graph': lambda stock: qsf.plot_monthly_heatmap(stock, context),
+                'Monthly Returns Graph': lambda stock: qsf.plot_returns(stock, symbol, benchmark, benchmark_symbol, context),
+                'Rolling Sharpe Graph': lambda stock: qsf.plot_rolling_sharpe(stock, symbol, benchmark, benchmark_symbol, context, windows),
+                'Rolling Sortino Graph': lambda stock: qsf.plot_rolling_sortino(stock, symbol, benchmark, benchmark_symbol, context, windows),
+                'Rolling Volatility Graph': lambda stock: qsf.plot_rolling_volatility(stock, symbol, benchmark, benchmark_symbol, context, windows),
+                'Rolling Beta Graph': lambda stock: qsf.plot_rolling_beta(stock, symbol, benchmark, benchmark_symbol, context, windows),
+                'Rolling Alpha Graph': lambda stock: qsf.plot_rolling_alpha(stock, symbol, benchmark, benchmark_symbol, context, windows),
+                'Rolling Correlation Graph': lambda stock: qsf.plot_rolling_correlation(stock, symbol, benchmark, benchmark_symbol, context, windows),
+                'Rolling Tracking Error Graph': lambda stock: qsf.plot_rolling_tracking_error(stock, symbol, benchmark, benchmark_symbol, context, windows),
+                'Yearly Returns Graph': lambda stock: qsf.plot_yearly_returns(stock, symbol, benchmark, benchmark_symbol, context)
             }
 
     table_functions = {
-                'Daily Returns Table (%)': lambda stock: qsf.table_daily_returns(stock, symbol, benchmark_symbol, benchmark),
-                'Drawdowns Periods Table': qsf.table_drawdowns_periods,
-                'Daily Earnings Table (%)': lambda stock: qsf.table_earnings(stock, symbol, benchmark_symbol, benchmark),
-                'Monthly Earnings Table (%)': lambda stock: qsf.table_monthly_earnings(stock, symbol, benchmark_symbol, benchmark),
-                'Yearly Earnings Table (%)': lambda stock: qsf.table_yearly_earnings(stock, symbol, benchmark_symbol, benchmark),
-                'Monthly Returns Table (%)': lambda stock: qsf.table_returns(stock, symbol, benchmark_symbol, benchmark),
-                'Rolling Sharpe Table': lambda stock: qsf.table_rolling_sharpe(stock, symbol, benchmark_symbol, benchmark),
-                'Rolling Sortino Table': lambda stock: qsf.table_rolling_sortino(stock, symbol, benchmark_symbol, benchmark),
-                'Rolling Volatility Table': lambda stock: qsf.table_rolling_volatility(stock, symbol, benchmark_symbol, benchmark),
-                'Yearly Returns Table (%)': lambda stock: qsf.table_yearly_returns(stock, symbol, benchmark_symbol, benchmark),
-                'Metrics Table': lambda stock: qsf.key_metrics(stock, symbol, benchmark_symbol, benchmark)
+                'Daily Returns Table (%)': lambda stock: qsf.table_daily_returns(stock, symbol, benchmark_symbol, benchmark, context),
+                'Drawdowns Periods Table': lambda stock: qsf.table_drawdowns_periods(stock, context),
+                'Daily Earnings Table (%)': lambda stock: qsf.table_earnings(stock, symbol, benchmark_symbol, benchmark, context),
+                'Monthly Earnings Table (%)': lambda stock: qsf.table_monthly_earnings(stock, symbol, benchmark_symbol, benchmark, context),
+                'Yearly Earnings Table (%)': lambda stock: qsf.table_yearly_earnings(stock, symbol, benchmark_symbol, benchmark, context),
+                'Monthly Returns Table (%)': lambda stock: qsf.table_returns(stock, symbol, benchmark_symbol, benchmark, context),
+                'Rolling Sharpe Table': lambda stock: qsf.table_rolling_sharpe(stock, symbol, benchmark_symbol, benchmark, context, windows),
+                'Rolling Sortino Table': lambda stock: qsf.table_rolling_sortino(stock, symbol, benchmark_symbol, benchmark, context, windows),
+                'Rolling Volatility Table': lambda stock: qsf.table_rolling_volatility(stock, symbol, benchmark_symbol, benchmark, context, windows),
+                'Rolling Beta Table': lambda stock: qsf.table_rolling_beta(stock, symbol, benchmark_symbol, benchmark, context, windows),
+                'Rolling Alpha Table': lambda stock: qsf.table_rolling_alpha(stock, symbol, benchmark_symbol, benchmark, context, windows),
+                'Rolling Correlation Table': lambda stock: qsf.table_rolling_correlation(stock, symbol, benchmark_symbol, benchmark, context, windows),
+                'Rolling Tracking Error Table': lambda stock: qsf.table_rolling_tracking_error(stock, symbol, benchmark_symbol, benchmark, context, windows),
+                'Yearly Returns Table (%)': lambda stock: qsf.table_yearly_returns(stock, symbol, benchmark_symbol, benchmark, context),
+                'Metrics Table': lambda stock: qsf.key_metrics(stock, symbol, benchmark_symbol, benchmark, context)
             }
 
         # Initialize a list to keep track of which column is free
@@ -151,14 +176,13 @@ if st.session_state['page'] == 'Custom Report':
         # Initialize a dictionary to store graphs
     graphs = {}
 
-    for option in selected_options:
+    # Compute every selected graph and table concurrently, then lay them out in order
+    for option, result, graph_html in render_options(selected_options, graph_functions, table_functions, stock):
             # If the option is 'Monthly Heatmap Graph', display it in a full-width container
             if option == 'Monthly Heatmap Graph':
-                fig = graph_functions[option](stock)
-                if fig is not None:
-                    st.plotly_chart(fig)
-                    # Convert the figure to HTML and store it in the dictionary
-                    graph_html = fig.to_html(full_html=False)
+                if result is not None:
+                    st.plotly_chart(result)
+                    # Store the figure's HTML in the dictionary
                     graphs[option] = graph_html
                 continue  # Skip the rest of the loop
 
@@ -166,16 +190,17 @@ if st.session_state['page'] == 'Custom Report':
             if free_column_index == 0:
                 columns = st.columns(2)
 
-            # Generate and display the graph or table
-            if option in graph_functions:
-                fig = graph_functions[option](stock)
+            # Display the graph or table
+            if result is None and option in benchmark_options:
+                columns[free_column_index].info(f"{option} needs a benchmark, check 'Include Benchmark' in the sidebar.")
+            elif option in graph_functions:
+                fig = result
                 if fig is not None:
                     columns[free_column_index].plotly_chart(fig)
-                    # Convert the figure to HTML and store it in the dictionary
-                    graph_html = fig.to_html(full_html=False)
+                    # Store the figure's HTML in the dictionary
                     graphs[option] = graph_html
             elif option in table_functions:
-                df = table_functions[option](stock)
+                df = result
                 if df is not None:
                     # Generate column definitions based on DataFrame columns
                     column_defs = [{'headerName': col, 'field': col, 'filter': True} for col in df.columns]
@@ -0,0 +1,201 @@
+from functools import cached_property
+import numpy as np
+import pandas as pd
+from modules.compounding import compound_returns
+from modules import drawdowns
+from modules.metrics_kernel import KEY_METRICS, evaluate_metrics
+from modules.rolling import ROLLING_WINDOW, prefix_sums, rolling_benchmark_stats, rolling_stats
+from modules.ingest import is_clean
+from modules.single_flight import SingleFlight
+
+def clean_returns(returns):
+    # Series normalized at ingest are already free of NaN and inf
+    if is_clean(returns):
+        return returns
+    return returns.dropna()
+
+def clean_drawdown(drawdown_series, returns):
+    # Clean returns can't produce infinite drawdowns
+    if is_clean(returns):
+        return drawdown_series
+    return drawdown_series.replace([np.inf, -np.inf, -0], 0)
+
+class SeriesAnalytics:
+    """
+    Intermediates derived from one returns series, computed on first use and
+    then reused by every plot and table.
+
+    Parameters:
+    - returns: A pandas Series of daily returns.
+    """
+
+    def __init__(self, returns):
+        self.returns = returns
+        self._metric_values = {}
+        self._rolling = {}
+        self._flight = SingleFlight()
+
+    @cached_property
+    def clean(self):
+        return clean_returns(self.returns)
+
+    @cached_property
+    def prices(self):
+        # Growth of $1 invested at the start of the range
+        return (1 + self.returns).cumprod()
+
+    @cached_property
+    def clean_prices(self):
+        if self.clean is self.returns:
+            return self.prices
+        return (1 + self.clean).cumprod()
+
+    @cached_property
+    def drawdown(self):
+        drawdown_series = drawdowns.underwater(self.clean_prices)
+        return clean_drawdown(drawdown_series, self.returns)
+
+    @cached_property
+    def drawdown_episodes(self):
+        return drawdowns.drawdown_episodes(self.drawdown)
+
+    @cached_property
+    def max_drawdown(self):
+        return drawdowns.max_drawdown(self.drawdown)
+
+    @cached_property
+    def ulcer_index(self):
+        return drawdowns.ulcer_index(self.drawdown)
+
+    @cached_property
+    def monthly(self):
+        return compound_returns(self.returns, 'M')
+
+    @cached_property
+    def yearly(self):
+        return compound_returns(self.returns, 'Y')
+
+    @cached_property
+    def observed_monthly(self):
+        # Months with data only, gaps in the series aren't 0% months to the metrics
+        return compound_returns(self.returns, 'M', skip_empty=True)
+
+    @cached_property
+    def observed_yearly(self):
+        return compound_returns(self.returns, 'Y', skip_empty=True)
+
+    @cached_property
+    def monthly_prices(self):
+        return (1 + self.monthly).cumprod()
+
+    @cached_property
+    def yearly_prices(self):
+        return (1 + self.yearly).cumprod()
+
+    @cached_property
+    def rolling_sums(self):
+        return prefix_sums(self.returns)
+
+    def rolling(self, windows=(ROLLING_WINDOW,)):
+        """
+        Returns the rolling statistics for the given window lengths, see
+        rolling.rolling_stats.
+        """
+        windows = tuple(windows)
+        if windows not in self._rolling:
+            self._rolling[windows] = self._flight.do(windows, rolling_stats, self.rolling_sums, windows)
+        return self._rolling[windows]
+
+    def metrics(self, names=KEY_METRICS):
+        """
+        Returns the requested metrics, computing only what they depend on and
+        reusing everything computed by earlier calls.
+        """
+        inputs = {
+            'returns': lambda: self.clean,
+            'max_drawdown': lambda: self.max_drawdown,
+            'ulcer_index': lambda: self.ulcer_index,
+            'monthly': lambda: self.observed_monthly,
+            'yearly': lambda: self.observed_yearly,
+        }
+        return evaluate_metrics(names, inputs, self._metric_values)
+
+class AnalyticsContext:
+    """
+    Shared analytics for one (symbol, benchmark, date range), built once per
+    report and passed to the plot_* and table_* functions so intermediates
+    like prices, drawdowns and monthly returns are only computed once.
+
+    Parameters:
+    - stock: A pandas Series containing the daily returns for the stock.
+    - symbol: The symbol of the stock.
+    - benchmark: A pandas Series containing the daily returns for the benchmark (optional).
+    - benchmark_symbol: The symbol of the benchmark (optional).
+    """
+
+    def __init__(self, stock, symbol=None, benchmark=None, benchmark_symbol=None):
+        self.symbol = symbol
+        self.benchmark_symbol = benchmark_symbol
+        self.stock = SeriesAnalytics(stock)
+        self.benchmark = SeriesAnalytics(benchmark) if benchmark is not None else None
+        self._benchmark_rolling = {}
+        self._frames = {}
+        # Graphs and tables may be computed concurrently, each key is computed once
+        self._flight = SingleFlight()
+
+    def frame(self, attribute):
+        """
+        Returns a series of the stock and of the benchmark side by side, joined
+        once on their shared DatetimeIndex and reused by every table.
+
+        Parameters:
+        - attribute: The SeriesAnalytics attribute to join, e.g. 'returns',
+          'prices' or 'monthly'.
+
+        Returns:
+        - A DataFrame with a 'stock' column and, with a benchmark, a 'benchmark'
+          column, NaN on the dates only one of them has.
+        """
+        if attribute not in self._frames:
+            self._frames[attribute] = self._flight.do(('frame', attribute), self._join, attribute)
+        return self._frames[attribute]
+
+    def _join(self, attribute):
+        columns = {'stock': getattr(self.stock, attribute)}
+        if self.benchmark is not None:
+            columns['benchmark'] = getattr(self.benchmark, attribute)
+        return pd.DataFrame(columns)
+
+    @cached_property
+    def aligned(self):
+        # Daily returns of the stock and benchmark on the shared calendar
+        return self.frame('returns')
+
+    @cached_property
+    def pair(self):
+        # Stock and benchmark returns on the dates both have one
+        return self.frame('clean').dropna()
+
+    def benchmark_rolling(self, windows=(ROLLING_WINDOW,)):
+        """
+        Returns the rolling beta, alpha, correlation and tracking error of the
+        stock against the benchmark, see rolling.rolling_benchmark_stats, or
+        None without a benchmark.
+        """
+        if self.benchmark is None:
+            return None
+        windows = tuple(windows)
+        if windows not in self._benchmark_rolling:
+            pair = self.pair
+            self._benchmark_rolling[windows] = self._flight.do(
+                ('benchmark_rolling', windows), rolling_benchmark_stats, pair.iloc[:, 0], pair.iloc[:, 1], windows)
+        return self._benchmark_rolling[windows]
+
+def ensure_context(context, stock, benchmark=None):
+    """
+    Returns the given context, or a throwaway one for callers that don't share
+    one between functions.
+    """
+    if context is None:
+        context = AnalyticsContext(stock, benchmark=benchmark)
+    return context
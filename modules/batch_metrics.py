@@ -0,0 +1,88 @@
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+from modules.compounding import PERIODS, compound_returns
+from modules.metrics_kernel import KEY_METRICS, evaluate_metrics
+from modules.returns_matrix import MATRIX_DIR, open_matrix
+
+def _drawdowns(values):
+    # Drawdowns of every column from its own start, NaN where there is no data
+    observed = ~np.isnan(values)
+    prices = np.cumprod(np.where(observed, 1 + values, 1.0), axis=0)
+    peaks = np.maximum(np.maximum.accumulate(prices, axis=0), 1.0)
+    return np.where(observed, prices / peaks - 1, np.nan)
+
+def _period_returns(returns, period):
+    # Compounded returns, NaN for the periods a symbol has no data in
+    observed = returns.notna().resample(PERIODS[period]).sum() > 0
+    return compound_returns(returns, period).where(observed)
+
+def batch_metrics(returns, metrics=KEY_METRICS):
+    """
+    Computes key metrics for many symbols at once.
+
+    Every metric is computed with column-wise numpy reductions over the whole
+    matrix, through the same metric graph as key_metrics, so only the requested
+    metrics and their dependencies are evaluated.
+
+    Parameters:
+    - returns: A dates x symbols DataFrame of daily returns, NaN where a symbol
+      has no data (e.g. ReturnsMatrix.frame()).
+    - metrics: The names of the metrics to compute, all of KEY_METRICS by default.
+
+    Returns:
+    - A symbols x metrics DataFrame, with returns as fractions. Symbols without
+      any data get NaN.
+    """
+    # Symbols without any data in the range would only produce warnings
+    observed = returns.columns[returns.notna().any().to_numpy()]
+    frame = returns[observed].astype(float)
+    values = frame.to_numpy()
+    cache = {}
+
+    def drawdown():
+        if 'drawdown' not in cache:
+            cache['drawdown'] = _drawdowns(values)
+        return cache['drawdown']
+
+    def ulcer_index():
+        dd = drawdown()
+        return np.sqrt(np.nansum(dd ** 2, axis=0) / (np.count_nonzero(~np.isnan(dd), axis=0) - 1))
+
+    inputs = {
+        'returns': lambda: values,
+        'max_drawdown': lambda: np.minimum(np.nanmin(drawdown(), axis=0), 0.0),
+        'ulcer_index': ulcer_index,
+        'monthly': lambda: _period_returns(frame, 'M'),
+        'yearly': lambda: _period_returns(frame, 'Y'),
+    }
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        results = evaluate_metrics(metrics, inputs)
+
+    metrics_df = pd.DataFrame(results, index=observed, columns=list(metrics))
+    return metrics_df.reindex(returns.columns).rename_axis('Symbol')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compute key metrics for every symbol of the returns matrix.')
+    parser.add_argument('symbols', nargs='*', help='symbols to include, every symbol of the matrix by default')
+    parser.add_argument('--metrics', nargs='+', default=KEY_METRICS, help='metrics to compute, all by default')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--sort', help='metric to rank the symbols by, descending')
+    parser.add_argument('--output', help='CSV file to write, printed by default')
+    parser.add_argument('--directory', default=MATRIX_DIR)
+    args = parser.parse_args()
+
+    matrix = open_matrix(args.directory)
+    if matrix is None:
+        parser.error(f'no returns matrix in {args.directory}, run python -m modules.returns_matrix first')
+
+    metrics_df = batch_metrics(matrix.frame(args.symbols or None, args.start, args.end), args.metrics)
+    if args.sort:
+        metrics_df = metrics_df.sort_values(args.sort, ascending=False)
+    if args.output:
+        metrics_df.to_csv(args.output)
+    else:
+        print(metrics_df.to_string())
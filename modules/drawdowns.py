@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+def underwater(prices):
+    """
+    Returns the drawdown series of a growth of $1 price series.
+
+    The drawdown is the decline from the running peak. Like quantstats, the
+    initial $1 counts as the first peak, so a loss on the first day shows up
+    as a drawdown.
+
+    Parameters:
+    - prices: A pandas Series of cumulative growth, (1 + returns).cumprod().
+    """
+    peaks = np.maximum(np.maximum.accumulate(prices), 1.0)
+    return (prices / peaks - 1.0).rename('drawdown')
+
+def max_drawdown(drawdown_series):
+    """
+    Returns the deepest drawdown, 0 if there is none.
+    """
+    return min(drawdown_series.min(), 0.0) if len(drawdown_series) else 0.0
+
+def ulcer_index(drawdown_series):
+    """
+    Returns the Ulcer Index, the root mean square of the drawdowns, with the
+    same n - 1 denominator as quantstats.
+    """
+    return np.sqrt((drawdown_series ** 2).sum() / (len(drawdown_series) - 1))
+
+def _lerp(low, high, t):
+    # Linear interpolation exact at both ends, the way numpy's quantile does it
+    diff = high - low
+    return np.where(t >= 0.5, high - diff * (1 - t), low + diff * t)
+
+def drawdown_episodes(drawdown_series):
+    """
+    Extracts every drawdown episode of a drawdown series at once.
+
+    An episode is a run of consecutive days below the previous peak. It ends
+    on the last day before the recovery, or on the last date of the series if
+    it never recovered. All statistics come from grouped reductions over the
+    episode ids, without a Python loop over the episodes.
+
+    Parameters:
+    - drawdown_series: A pandas Series of drawdowns (0 at peaks, negative below).
+
+    Returns:
+    - A pandas DataFrame with one row per episode in date order and the columns
+      'start', 'valley', 'end', 'days' (calendar days, both ends included),
+      'max drawdown' and '99% max drawdown' (the deepest value above the
+      episode's 1% quantile, NaN when there is none).
+    """
+    values = drawdown_series.to_numpy(dtype=float)
+    dates = drawdown_series.index
+
+    # Rows in a drawdown and where each episode starts and ends
+    in_dd = values != 0
+    previous = np.r_[False, in_dd[:-1]]
+    following = np.r_[in_dd[1:], False]
+    start_pos = np.flatnonzero(in_dd & ~previous)
+    end_pos = np.flatnonzero(in_dd & ~following)
+
+    if len(start_pos) == 0:
+        no_dates = dates[:0]
+        return pd.DataFrame({
+            'start': no_dates,
+            'valley': no_dates,
+            'end': no_dates,
+            'days': np.array([], dtype=int),
+            'max drawdown': np.array([]),
+            '99% max drawdown': np.array([]),
+        })
+
+    # Episode id of every row in a drawdown, the rows of an episode are contiguous
+    rows = np.flatnonzero(in_dd)
+    sizes = end_pos - start_pos + 1
+    episode = np.repeat(np.arange(len(start_pos)), sizes)
+    offsets = np.r_[0, np.cumsum(sizes)[:-1]]
+
+    # Sort each episode's values, ties keep date order so the valley is the first minimum
+    order = np.lexsort((values[rows], episode))
+    sorted_values = values[rows][order]
+    depth = sorted_values[offsets]
+    valley_pos = rows[order[offsets]]
+
+    # 1% quantile of each episode with linear interpolation
+    position = 0.01 * (sizes - 1)
+    low = np.floor(position).astype(int)
+    high = np.minimum(low + 1, sizes - 1)
+    quantile = _lerp(sorted_values[offsets + low], sorted_values[offsets + high], position - low)
+
+    # Deepest value strictly above the quantile of its episode
+    above = np.where(sorted_values > np.repeat(quantile, sizes), sorted_values, np.inf)
+    depth_99 = np.minimum.reduceat(above, offsets)
+    depth_99[np.isinf(depth_99)] = np.nan
+
+    starts = dates[start_pos]
+    ends = dates[end_pos]
+    return pd.DataFrame({
+        'start': starts,
+        'valley': dates[valley_pos],
+        'end': ends,
+        'days': (ends - starts).days + 1,
+        'max drawdown': depth,
+        '99% max drawdown': depth_99,
+    })
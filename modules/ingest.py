@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+def is_clean(returns):
+    """
+    Returns True if a series went through normalize_returns, in which case
+    downstream functions can skip their own cleanup.
+    """
+    return returns.attrs.get('clean', False)
+
+def normalize_returns(returns):
+    """
+    Validates and normalizes a returns series once, when it enters the cache.
+
+    Drops NaN and infinite values, sorts the index if it isn't monotonic,
+    removes duplicate dates (keeping the last value) and makes the index a
+    tz-naive DatetimeIndex named 'Date'. The result is flagged as clean in
+    its attrs, and pandas carries the flag over to slices of it.
+
+    Parameters:
+    - returns: A pandas Series of returns indexed by date.
+
+    Returns:
+    - The normalized Series. Data that is already clean is not copied.
+    """
+    if is_clean(returns):
+        return returns
+
+    values = returns.to_numpy()
+    if not np.issubdtype(values.dtype, np.floating):
+        values = values.astype(float)
+
+    index = pd.DatetimeIndex(returns.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+
+    # Each step only copies when it actually has something to fix
+    finite = np.isfinite(values)
+    if not finite.all():
+        values, index = values[finite], index[finite]
+
+    if not index.is_monotonic_increasing:
+        order = index.argsort(kind='stable')
+        values, index = values[order], index[order]
+
+    duplicated = index.duplicated(keep='last')
+    if duplicated.any():
+        values, index = values[~duplicated], index[~duplicated]
+
+    clean = pd.Series(values, index=index.rename('Date'), name=returns.name, copy=False)
+    clean.attrs['clean'] = True
+    return clean
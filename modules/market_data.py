@@ -0,0 +1,123 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from modules.date_index import slice_dates
+from modules.ingest import normalize_returns
+from modules.providers import get_provider
+from modules.rate_limiter import provider_limiter
+from modules.returns_matrix import open_matrix
+from modules.returns_store import check_symbol, load_returns, returns_store
+from modules.shared_cache import returns_cache
+from modules.single_flight import SingleFlight
+
+# Threads used to load several symbols at the same time
+FETCH_WORKERS = int(os.environ.get('MM_FETCH_WORKERS', 8))
+
+# Where returns come from, see providers.get_provider for the options
+provider = get_provider()
+
+# Concurrent loads of the same symbol share one download
+_loads = SingleFlight()
+
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='fetch')
+
+def _download(symbol, **kwargs):
+    # Only calls that actually reach the provider are rate limited
+    provider_limiter.acquire()
+    return provider.download_returns(symbol, **kwargs)
+
+def _load(key, symbol):
+    # Another caller may have filled the cache while we waited to lead
+    returns = returns_cache.get(key)
+    if returns is not None:
+        return returns
+
+    # Remote providers go through a fresh packed matrix or the on-disk store,
+    # local ones are read directly
+    matrix = open_matrix() if provider.remote else None
+    if matrix is not None and key in matrix and time.time() - matrix.built_at < returns_store.max_age:
+        returns = matrix.series(key)
+    elif provider.remote:
+        returns = load_returns(symbol, _download)
+    else:
+        returns = provider.download_returns(symbol)
+
+    # Clean the series once here so the analytics don't have to
+    returns = normalize_returns(returns)
+
+    # Don't remember unknown tickers, the user is probably still typing
+    if not returns.empty:
+        returns_cache.put(key, returns)
+    return returns
+
+def get_returns(symbol):
+    """
+    Returns the daily returns for a symbol from the process-wide cache, loading
+    them through the on-disk store on a miss.
+
+    The returned Series is shared between sessions and must not be modified
+    in place.
+
+    Parameters:
+    - symbol: The ticker symbol.
+
+    Returns:
+    - A pandas Series of daily returns, empty if the ticker does not exist.
+
+    Raises:
+    - ValueError: If symbol is not a valid ticker symbol.
+    """
+    check_symbol(symbol)
+    key = symbol.upper()
+    returns = returns_cache.get(key)
+    if returns is not None:
+        return returns
+
+    return _loads.do(key, _load, key, symbol)
+
+def align_returns(*series):
+    """
+    Trims return series to the date span they all cover, the same way
+    quantstats matches a strategy with its benchmark. Empty series are left
+    untouched.
+    """
+    available = [s for s in series if not s.empty]
+    if len(available) < 2:
+        return list(series)
+
+    start = max(s.index[0] for s in available)
+    end = min(s.index[-1] for s in available)
+    return [slice_dates(s, start, end) if not s.empty else s for s in series]
+
+def fetch_returns(symbol, benchmark_symbols=()):
+    """
+    Loads a stock and its benchmarks concurrently and aligns them.
+
+    Cached symbols are served directly, only cache misses are handed to the
+    thread pool so they download in parallel.
+
+    Parameters:
+    - symbol: The ticker symbol of the stock.
+    - benchmark_symbols: An iterable of benchmark ticker symbols.
+
+    Returns:
+    - A tuple of the stock returns and a list of benchmark returns in the
+      order of benchmark_symbols. Unknown tickers come back as empty Series.
+
+    Raises:
+    - ValueError: If any symbol is not a valid ticker symbol.
+    """
+    symbols = [symbol, *benchmark_symbols]
+    for s in symbols:
+        check_symbol(s)
+    cached = [returns_cache.get(s.upper()) for s in symbols]
+
+    misses = [s for s, returns in zip(symbols, cached) if returns is None]
+    if len(misses) > 1:
+        futures = {s: _executor.submit(get_returns, s) for s in misses}
+        cached = [returns if returns is not None else futures[s].result() for s, returns in zip(symbols, cached)]
+    elif misses:
+        cached = [returns if returns is not None else get_returns(s) for s, returns in zip(symbols, cached)]
+
+    stock, *benchmarks = align_returns(*cached)
+    return stock, benchmarks
@@ -0,0 +1,102 @@
+import functools
+import hashlib
+import os
+import sys
+import numpy as np
+import pandas as pd
+from modules.analytics_context import AnalyticsContext
+from modules.shared_cache import TTLCache, sizeof
+from modules.single_flight import SingleFlight
+
+# Memory budget of the rendered figures and tables in bytes
+MEMO_MAX_BYTES = int(os.environ.get('MM_MEMO_MAX_BYTES', 64 * 1024 * 1024))
+
+def fingerprint(data):
+    """
+    Returns a cheap key identifying the contents of a Series or DataFrame: its
+    shape, first and last dates and a hash of the values buffer, or None
+    without data.
+    """
+    if data is None:
+        return None
+    values = np.ascontiguousarray(data.to_numpy())
+    if values.dtype == object:
+        digest = pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes()
+    else:
+        digest = values.data
+    first, last = (data.index[0], data.index[-1]) if len(data) else (None, None)
+    return (type(data).__name__, data.shape, first, last, hashlib.blake2b(digest, digest_size=16).hexdigest())
+
+def _key(value):
+    # Hashable stand-in for an argument, data by fingerprint
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return fingerprint(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_key(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((name, _key(item)) for name, item in value.items()))
+    return value
+
+def _deep_sizeof(value):
+    # Size of a nested structure of dicts, lists and arrays
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return value.nbytes + sum(_deep_sizeof(item) for item in value.ravel())
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_deep_sizeof(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_deep_sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+def _sizeof(value):
+    # Figures are sized from their traces and their layout, which holds the
+    # annotations and shapes
+    if hasattr(value, 'to_plotly_json'):
+        return _deep_sizeof(value.to_plotly_json())
+    if isinstance(value, tuple):
+        return sum(_sizeof(item) for item in value)
+    return sizeof(value)
+
+# Rendered figures and tables shared by every session, evicted by size only
+memo_cache = TTLCache(ttl=None, max_bytes=MEMO_MAX_BYTES, sizeof=_sizeof)
+
+_flights = SingleFlight()
+
+_MISSING = object()
+
+def memoize(fn):
+    """
+    Caches the results of a plot or table function by the fingerprints of its
+    series and its other arguments.
+
+    The analytics context is left out of the key, it is derived from the
+    series. Tables are returned as copies so callers can't change the cached
+    one, figures are shared and must be treated as read-only.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (
+            fn.__module__, fn.__qualname__,
+            _key([arg for arg in args if not isinstance(arg, AnalyticsContext)]),
+            _key({name: arg for name, arg in kwargs.items() if not isinstance(arg, AnalyticsContext)}),
+        )
+        result = memo_cache.get(key, _MISSING)
+        if result is _MISSING:
+            # Concurrent renders of the same key compute it once
+            result = _flights.do(key, lambda: memo_cache.put(key, fn(*args, **kwargs)))
+        return result.copy() if isinstance(result, pd.DataFrame) else result
+    return wrapper
+
+def figure_html(fig):
+    """
+    Returns the HTML of a figure for embedding, without plotly.js, cached
+    while the figure is, since memoized figures are shown again on every
+    rerun.
+    """
+    key = ('html', id(fig))
+    entry = memo_cache.get(key)
+    # The figure is kept in the entry, so its id can't be reused by another one
+    if entry is None or entry[0] is not fig:
+        entry = memo_cache.put(key, (fig, fig.to_html(full_html=False, include_plotlyjs=False)))
+    return entry[1]
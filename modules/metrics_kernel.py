@@ -0,0 +1,358 @@
+import numpy as np
+from scipy.stats import norm
+from modules.streaks import streak_arrays
+
+# Trading days per year used to annualize, as in quantstats
+PERIODS_PER_YEAR = 252
+
+# Registered nodes, name -> (function, names of its inputs)
+METRICS = {}
+
+# Metrics of the metrics table, in display order
+KEY_METRICS = [
+    'Cumulative Return', 'CAGR', 'Sharpe', 'Prob. Sharpe Ratio', 'Smart Sharpe', 'Sortino', 'Smart Sortino',
+    'Sortino/√2', 'Smart Sortino/√2', 'Max Drawdown', 'Volatility (ann.)', 'Calmar', 'Skew', 'Kurtosis',
+    'Expected Daily', 'Expected Monthly', 'Expected Yearly', 'Best Day', 'Worst Day', 'Best Month', 'Worst Month',
+    'Recovery Factor', 'Ulcer Index', 'Worst Year', 'Best Year', 'Payoff Ratio', 'Profit Factor',
+    'Common Sense Ratio', 'CPC Index', 'Risk of Ruin', 'Daily Value-at-Risk', 'Gain/Pain Ratio', 'Tail Ratio',
+]
+
+def metric(name, *inputs):
+    """
+    Registers a function computing the metric or intermediate `name` from the
+    values of `inputs`, which are other registered nodes or evaluation inputs.
+    """
+    def register(function):
+        METRICS[name] = (function, inputs)
+        return function
+    return register
+
+def evaluate_metrics(names, inputs, values=None):
+    """
+    Evaluates the requested metrics and only the nodes they depend on, each
+    once.
+
+    Nodes are written with column-wise reductions, so the same graph works on
+    one returns series or on a dates x symbols matrix with NaN outside each
+    symbol's history.
+
+    Parameters:
+    - names: The names of the metrics to compute.
+    - inputs: A dict mapping the input names ('returns', 'max_drawdown',
+      'ulcer_index', 'monthly' and 'yearly') to functions returning them, only
+      called when a requested metric needs them.
+    - values: A dict of already evaluated nodes, filled in place so later
+      calls reuse them (optional).
+
+    Returns:
+    - A dict of metric name to value, with returns as fractions.
+    """
+    if values is None:
+        values = {}
+
+    def resolve(name):
+        if name not in values:
+            if name in inputs:
+                values[name] = inputs[name]()
+            else:
+                function, dependencies = METRICS[name]
+                values[name] = function(*[resolve(dependency) for dependency in dependencies])
+        return values[name]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {name: resolve(name) for name in names}
+
+def _scalar(value):
+    # 0-d arrays back to numpy scalars, arrays unchanged
+    return np.asarray(value)[()]
+
+def _divide(numerator, denominator):
+    # quantstats reports NaN instead of dividing by zero
+    return _scalar(np.where(denominator != 0, numerator / denominator, np.nan))
+
+def _zero_fperr(value):
+    # pandas treats sums of powers this small as floating point noise
+    return np.where(np.abs(value) < 1e-14, 0.0, value)
+
+def _count(values):
+    return np.count_nonzero(~np.isnan(values), axis=0)
+
+# Shared intermediates
+
+@metric('values', 'returns')
+def _values(returns):
+    values = np.asarray(returns, dtype=float)
+    finite = np.isfinite(values)
+    if finite.all():
+        return values
+    return np.where(finite, values, np.nan)
+
+@metric('count', 'values')
+def _observations(values):
+    return _count(values)
+
+@metric('total', 'values')
+def _total(values):
+    return np.nansum(values, axis=0)
+
+@metric('mean', 'total', 'count')
+def _mean(total, count):
+    return total / count
+
+@metric('moments', 'values', 'mean')
+def _moments(values, mean):
+    # Second, third and fourth central moment sums
+    deviations = values - mean
+    squares = deviations * deviations
+    return (np.nansum(squares, axis=0), np.nansum(squares * deviations, axis=0),
+            np.nansum(squares * squares, axis=0))
+
+@metric('std', 'moments', 'count')
+def _std(moments, count):
+    return np.sqrt(moments[0] / (count - 1))
+
+@metric('losses', 'values')
+def _losses(values):
+    return np.where(values < 0, values, 0.0)
+
+@metric('loss_sum', 'losses')
+def _loss_sum(losses):
+    return losses.sum(axis=0)
+
+@metric('loss_count', 'losses')
+def _loss_count(losses):
+    return np.count_nonzero(losses, axis=0)
+
+@metric('win_sum', 'values')
+def _win_sum(values):
+    return np.where(values > 0, values, 0.0).sum(axis=0)
+
+@metric('win_count', 'values')
+def _win_count(values):
+    return np.count_nonzero(values > 0, axis=0)
+
+@metric('win_rate', 'win_count', 'loss_count')
+def _win_rate(win_count, loss_count):
+    return _scalar(np.where(win_count + loss_count > 0, win_count / (win_count + loss_count), 0.0))
+
+@metric('downside', 'losses', 'count')
+def _downside(losses, count):
+    return np.sqrt((losses * losses).sum(axis=0) / count)
+
+@metric('log_growth', 'values')
+def _log_growth(values):
+    return np.nansum(np.log1p(values), axis=0)
+
+@metric('tails', 'values')
+def _tails(values):
+    # 5% and 95% quantiles with linear interpolation
+    if not np.isnan(values).any():
+        return np.quantile(values, [0.05, 0.95], axis=0)
+
+    # NaN sorts last, so the observations of every column are its first rows
+    ordered = np.sort(values, axis=0)
+    last = np.maximum(_count(values) - 1, 0)
+    tails = []
+    for q in (0.05, 0.95):
+        position = q * last
+        low = np.floor(position).astype(int)
+        high = np.minimum(low + 1, last)
+        low_value = np.take_along_axis(ordered, np.expand_dims(low, 0), axis=0)[0]
+        high_value = np.take_along_axis(ordered, np.expand_dims(high, 0), axis=0)[0]
+        tails.append(low_value + (high_value - low_value) * (position - low))
+    return np.array(tails)
+
+@metric('penalty', 'values', 'count')
+def _autocorr_penalty(values, count):
+    # Penalty applied to the smart ratios for the lag 1 autocorrelation
+    current, following = values[:-1], values[1:]
+    pairs = ~(np.isnan(current) | np.isnan(following))
+    pair_count = np.count_nonzero(pairs, axis=0)
+    current_mean = np.where(pairs, current, 0.0).sum(axis=0) / pair_count
+    following_mean = np.where(pairs, following, 0.0).sum(axis=0) / pair_count
+    current_dev = np.where(pairs, current - current_mean, 0.0)
+    following_dev = np.where(pairs, following - following_mean, 0.0)
+    coef = np.abs((current_dev * following_dev).sum(axis=0) /
+                  np.sqrt((current_dev ** 2).sum(axis=0) * (following_dev ** 2).sum(axis=0)))
+
+    # sum((n - x) / n * coef ** x) for x in 1..n-1, as a closed form geometric series
+    n = np.asarray(count, dtype=float)
+    weighted = (coef * (1 - coef ** (n - 1)) / (1 - coef)
+                - coef * (1 - n * coef ** (n - 1) + (n - 1) * coef ** n) / (n * (1 - coef) ** 2))
+
+    # The closed form cancels badly as coef approaches 1, sum those few directly
+    weighted = np.atleast_1d(weighted)
+    for column in np.flatnonzero(np.atleast_1d(coef) > 0.99):
+        n_column, coef_column = np.atleast_1d(n)[column], np.atleast_1d(coef)[column]
+        lags = np.arange(1, n_column)
+        weighted[column] = np.sum((n_column - lags) / n_column * coef_column ** lags)
+    penalty = np.sqrt(1 + 2 * weighted.reshape(np.shape(coef)))
+    return _scalar(np.where((count < 2) | np.isnan(coef) | (coef == 0), 1.0, penalty))
+
+@metric('streaks', 'values')
+def _streaks(values):
+    streaks = streak_arrays(values.reshape(len(values), -1))
+    return {name: _scalar(value.reshape(np.shape(values)[1:])) for name, value in streaks.items()}
+
+@metric('daily_sharpe', 'mean', 'std')
+def _daily_sharpe(mean, std):
+    return mean / std
+
+@metric('daily_sortino', 'mean', 'downside')
+def _daily_sortino(mean, downside):
+    return _divide(mean, downside)
+
+# Metrics of the metrics table
+
+@metric('Cumulative Return', 'log_growth')
+def cumulative_return(log_growth):
+    return np.expm1(log_growth)
+
+@metric('CAGR', 'Cumulative Return', 'count')
+def cagr(cumulative, count):
+    return (1 + cumulative) ** (PERIODS_PER_YEAR / count) - 1
+
+@metric('Sharpe', 'daily_sharpe')
+def sharpe(daily_sharpe):
+    return daily_sharpe * np.sqrt(PERIODS_PER_YEAR)
+
+@metric('Prob. Sharpe Ratio', 'daily_sharpe', 'Skew', 'Kurtosis', 'count')
+def probabilistic_sharpe_ratio(daily_sharpe, skew, kurtosis, count):
+    sigma = np.sqrt((1 - skew * daily_sharpe + (kurtosis + 2) / 4 * daily_sharpe ** 2) / (count - 1))
+    return norm.cdf(daily_sharpe / sigma)
+
+@metric('Smart Sharpe', 'daily_sharpe', 'penalty')
+def smart_sharpe(daily_sharpe, penalty):
+    return daily_sharpe / penalty * np.sqrt(PERIODS_PER_YEAR)
+
+@metric('Sortino', 'daily_sortino')
+def sortino(daily_sortino):
+    return daily_sortino * np.sqrt(PERIODS_PER_YEAR)
+
+@metric('Smart Sortino', 'daily_sortino', 'penalty')
+def smart_sortino(daily_sortino, penalty):
+    return daily_sortino / penalty * np.sqrt(PERIODS_PER_YEAR)
+
+@metric('Sortino/√2', 'Sortino')
+def sortino_sqrt2(sortino):
+    return sortino / np.sqrt(2)
+
+@metric('Smart Sortino/√2', 'Smart Sortino')
+def smart_sortino_sqrt2(smart_sortino):
+    return smart_sortino / np.sqrt(2)
+
+@metric('Max Drawdown', 'max_drawdown')
+def max_drawdown(max_drawdown):
+    return max_drawdown
+
+@metric('Volatility (ann.)', 'std')
+def volatility(std):
+    return std * np.sqrt(PERIODS_PER_YEAR)
+
+@metric('Calmar', 'CAGR', 'Max Drawdown')
+def calmar(cagr, max_drawdown):
+    return cagr / np.abs(max_drawdown)
+
+@metric('Skew', 'moments', 'count')
+def skew(moments, count):
+    # Bias corrected like pandas' skew
+    m2, m3 = _zero_fperr(moments[0]), _zero_fperr(moments[1])
+    result = np.where(m2 == 0, 0.0, count * (count - 1) ** 0.5 / (count - 2) * m3 / m2 ** 1.5)
+    return _scalar(np.where(count < 3, np.nan, result))
+
+@metric('Kurtosis', 'moments', 'count')
+def kurtosis(moments, count):
+    # Excess kurtosis, bias corrected like pandas' kurtosis
+    numerator = _zero_fperr(count * (count + 1) * (count - 1) * moments[2])
+    denominator = _zero_fperr((count - 2) * (count - 3) * moments[0] ** 2)
+    result = numerator / denominator - 3 * (count - 1) ** 2 / ((count - 2) * (count - 3))
+    result = np.where(denominator == 0, 0.0, result)
+    return _scalar(np.where(count < 4, np.nan, result))
+
+@metric('Expected Daily', 'log_growth', 'count')
+def expected_daily(log_growth, count):
+    return np.expm1(log_growth / count)
+
+@metric('Expected Monthly', 'log_growth', 'monthly')
+def expected_monthly(log_growth, monthly):
+    # The log growth of the whole series is the sum of the months' log growths
+    return np.expm1(log_growth / _count(np.asarray(monthly, dtype=float)))
+
+@metric('Expected Yearly', 'log_growth', 'yearly')
+def expected_yearly(log_growth, yearly):
+    return np.expm1(log_growth / _count(np.asarray(yearly, dtype=float)))
+
+@metric('Best Day', 'values')
+def best_day(values):
+    return np.nanmax(values, axis=0)
+
+@metric('Worst Day', 'values')
+def worst_day(values):
+    return np.nanmin(values, axis=0)
+
+@metric('Best Month', 'monthly')
+def best_month(monthly):
+    return np.nanmax(np.asarray(monthly, dtype=float), axis=0)
+
+@metric('Worst Month', 'monthly')
+def worst_month(monthly):
+    return np.nanmin(np.asarray(monthly, dtype=float), axis=0)
+
+@metric('Best Year', 'yearly')
+def best_year(yearly):
+    return np.nanmax(np.asarray(yearly, dtype=float), axis=0)
+
+@metric('Worst Year', 'yearly')
+def worst_year(yearly):
+    return np.nanmin(np.asarray(yearly, dtype=float), axis=0)
+
+@metric('Recovery Factor', 'total', 'Max Drawdown')
+def recovery_factor(total, max_drawdown):
+    return _divide(np.abs(total), np.abs(max_drawdown))
+
+@metric('Ulcer Index', 'ulcer_index')
+def ulcer_index(ulcer_index):
+    return ulcer_index
+
+@metric('Payoff Ratio', 'win_sum', 'win_count', 'loss_sum', 'loss_count')
+def payoff_ratio(win_sum, win_count, loss_sum, loss_count):
+    return _divide(win_sum / win_count, np.abs(loss_sum / loss_count))
+
+@metric('Profit Factor', 'total', 'loss_sum')
+def profit_factor(total, loss_sum):
+    gains = total - loss_sum
+    return _scalar(np.where(loss_sum != 0, gains / np.abs(loss_sum), np.where(gains == 0, 0.0, np.inf)))
+
+@metric('Common Sense Ratio', 'Profit Factor', 'Tail Ratio')
+def common_sense_ratio(profit_factor, tail_ratio):
+    return profit_factor * tail_ratio
+
+@metric('CPC Index', 'Profit Factor', 'win_rate', 'Payoff Ratio')
+def cpc_index(profit_factor, win_rate, payoff_ratio):
+    return profit_factor * win_rate * payoff_ratio
+
+@metric('Risk of Ruin', 'win_rate', 'count')
+def risk_of_ruin(win_rate, count):
+    return ((1 - win_rate) / (1 + win_rate)) ** count
+
+@metric('Daily Value-at-Risk', 'mean', 'std')
+def value_at_risk(mean, std):
+    return norm.ppf(0.05, mean, std)
+
+@metric('Gain/Pain Ratio', 'total', 'loss_sum')
+def gain_to_pain_ratio(total, loss_sum):
+    return _divide(total, np.abs(loss_sum))
+
+@metric('Tail Ratio', 'tails')
+def tail_ratio(tails):
+    return _divide(np.abs(tails[1]), np.abs(tails[0]))
+
+# Other metrics
+
+@metric('Max Consecutive Wins', 'streaks')
+def max_consecutive_wins(streaks):
+    return streaks['win longest']
+
+@metric('Max Consecutive Losses', 'streaks')
+def max_consecutive_losses(streaks):
+    return streaks['loss longest']
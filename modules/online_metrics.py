@@ -0,0 +1,253 @@
+import argparse
+import copy
+import numpy as np
+import pandas as pd
+from modules.compounding import compound_returns
+from modules.metrics_kernel import evaluate_metrics
+
+# Metrics available from the accumulators, the others need the whole series
+ONLINE_METRICS = [
+    'Cumulative Return', 'CAGR', 'Sharpe', 'Prob. Sharpe Ratio', 'Sortino', 'Sortino/√2', 'Max Drawdown',
+    'Volatility (ann.)', 'Calmar', 'Skew', 'Kurtosis', 'Expected Daily', 'Expected Monthly', 'Expected Yearly',
+    'Best Day', 'Worst Day', 'Best Month', 'Worst Month', 'Recovery Factor', 'Ulcer Index', 'Worst Year',
+    'Best Year', 'Payoff Ratio', 'Profit Factor', 'CPC Index', 'Risk of Ruin', 'Daily Value-at-Risk',
+    'Gain/Pain Ratio',
+]
+
+# Accumulator fields saved with the state
+FIELDS = [
+    'count', 'mean', 'm2', 'm3', 'm4', 'total', 'loss_sum', 'loss_squares', 'loss_count', 'win_sum', 'win_count',
+    'log_growth', 'best_day', 'worst_day', 'price', 'peak', 'max_drawdown', 'drawdown_squares',
+    'month', 'month_growth', 'months', 'year', 'year_growth', 'years',
+]
+
+def _month(date):
+    return date.year * 12 + date.month - 1
+
+class OnlineMetrics:
+    """
+    Accumulators of a returns series that are updated in O(1) per new day.
+
+    They hold running moments (Welford's algorithm extended to the third and
+    fourth moment), sign-split sums, the compounded growth, the running peak
+    and drawdown, and the compounded return of the current month and year.
+    Completed months and years are kept as a short list of returns.
+
+    Only days up to `last_date` are committed. The newest day of the series
+    may still be a partial intraday bar, so it is kept aside as `pending` and
+    only applied to a copy when the metrics are read.
+
+    The accumulators cover a symbol's whole stored history and are read by
+    this module's CLI. The report's metrics table is computed over the
+    selected date range, whose start moves with the days, so it still
+    evaluates key_metrics from the sliced series.
+    """
+
+    def __init__(self):
+        self.last_date = None
+        self.pending = None
+        self.count = 0
+        self.mean = self.m2 = self.m3 = self.m4 = 0.0
+        self.total = self.loss_sum = self.loss_squares = self.win_sum = 0.0
+        self.loss_count = self.win_count = 0
+        self.log_growth = 0.0
+        self.best_day, self.worst_day = -np.inf, np.inf
+        self.price = self.peak = 1.0
+        self.max_drawdown = self.drawdown_squares = 0.0
+        self.month = self.year = None
+        self.month_growth = self.year_growth = 0.0
+        self.months, self.years = [], []
+
+    def add(self, date, value):
+        """
+        Commits one day's return. Days must be added in date order.
+        """
+        date = pd.Timestamp(date)
+        self.last_date = date
+        if not np.isfinite(value):
+            return
+
+        # Running central moments
+        count = self.count + 1
+        delta = value - self.mean
+        delta_n = delta / count
+        delta_n2 = delta_n * delta_n
+        term = delta * delta_n * self.count
+        self.m4 += term * delta_n2 * (count * count - 3 * count + 3) + 6 * delta_n2 * self.m2 - 4 * delta_n * self.m3
+        self.m3 += term * delta_n * (count - 2) - 3 * delta_n * self.m2
+        self.m2 += term
+        self.mean += delta_n
+        self.count = count
+
+        # Sums of gains and losses
+        self.total += value
+        if value < 0:
+            self.loss_sum += value
+            self.loss_squares += value * value
+            self.loss_count += 1
+        elif value > 0:
+            self.win_sum += value
+            self.win_count += 1
+        self.best_day = max(self.best_day, value)
+        self.worst_day = min(self.worst_day, value)
+
+        # Compounded growth, peak and drawdown
+        growth = np.log1p(value)
+        self.log_growth += growth
+        self.price *= 1 + value
+        self.peak = max(self.peak, self.price)
+        drawdown = self.price / self.peak - 1
+        self.max_drawdown = min(self.max_drawdown, drawdown)
+        self.drawdown_squares += drawdown * drawdown
+
+        # Period buckets, a new month or year closes the current one
+        if self.month is not None and _month(date) != self.month:
+            self.months.append(float(np.expm1(self.month_growth)))
+            self.month_growth = 0.0
+        if self.year is not None and date.year != self.year:
+            self.years.append(float(np.expm1(self.year_growth)))
+            self.year_growth = 0.0
+        self.month, self.year = _month(date), date.year
+        self.month_growth += growth
+        self.year_growth += growth
+
+    @classmethod
+    def from_returns(cls, returns):
+        """
+        Builds the accumulators of a whole returns series in one vectorized
+        pass, committing every day.
+        """
+        state = cls()
+        values = returns.to_numpy(dtype=float)
+        finite = np.isfinite(values)
+        if len(values):
+            state.last_date = returns.index[-1]
+        if not finite.any():
+            return state
+        returns = returns[finite]
+        values = values[finite]
+
+        state.count = len(values)
+        state.mean = values.mean()
+        deviations = values - state.mean
+        squares = deviations * deviations
+        state.m2, state.m3, state.m4 = squares.sum(), (squares * deviations).sum(), (squares * squares).sum()
+
+        losses = values[values < 0]
+        gains = values[values > 0]
+        state.total = values.sum()
+        state.loss_sum, state.loss_squares, state.loss_count = losses.sum(), (losses * losses).sum(), len(losses)
+        state.win_sum, state.win_count = gains.sum(), len(gains)
+        state.best_day, state.worst_day = values.max(), values.min()
+
+        prices = np.cumprod(1 + values)
+        drawdowns = prices / np.maximum(np.maximum.accumulate(prices), 1.0) - 1
+        state.log_growth = np.log1p(values).sum()
+        state.price, state.peak = prices[-1], max(prices.max(), 1.0)
+        state.max_drawdown = min(drawdowns.min(), 0.0)
+        state.drawdown_squares = (drawdowns * drawdowns).sum()
+
+        # Closed periods as returns, the last one stays open as log growth
+        monthly = compound_returns(returns, 'M', skip_empty=True)
+        yearly = compound_returns(returns, 'Y', skip_empty=True)
+        state.months, state.month_growth = monthly.iloc[:-1].tolist(), float(np.log1p(monthly.iloc[-1]))
+        state.years, state.year_growth = yearly.iloc[:-1].tolist(), float(np.log1p(yearly.iloc[-1]))
+        state.month, state.year = _month(returns.index[-1]), returns.index[-1].year
+        return state
+
+    def snapshot(self):
+        """
+        Returns a copy of the accumulators with the pending day applied.
+        """
+        state = copy.deepcopy(self)
+        if state.pending is not None:
+            state.add(*state.pending)
+            state.pending = None
+        return state
+
+    def metrics(self, names=ONLINE_METRICS):
+        """
+        Returns the requested metrics, including the pending day, evaluated
+        by the metric graph from the accumulators instead of the series.
+
+        Parameters:
+        - names: Names of metrics from ONLINE_METRICS.
+
+        Returns:
+        - A dict of metric name to value, with returns as fractions.
+        """
+        state = self.snapshot()
+        count = state.count
+        values = {
+            'count': count,
+            'total': state.total,
+            'mean': state.mean if count else np.nan,
+            'moments': (state.m2, state.m3, state.m4),
+            'std': np.sqrt(state.m2 / (count - 1)) if count > 1 else np.nan,
+            'loss_sum': state.loss_sum,
+            'loss_count': state.loss_count,
+            'win_sum': state.win_sum,
+            'win_count': state.win_count,
+            'downside': np.sqrt(state.loss_squares / count) if count else np.nan,
+            'log_growth': state.log_growth,
+            'Best Day': state.best_day if count else np.nan,
+            'Worst Day': state.worst_day if count else np.nan,
+        }
+        open_periods = [] if state.month is None else [np.expm1(state.month_growth)]
+        inputs = {
+            'max_drawdown': lambda: state.max_drawdown,
+            'ulcer_index': lambda: np.sqrt(state.drawdown_squares / (count - 1)) if count > 1 else np.nan,
+            'monthly': lambda: np.array(state.months + open_periods, dtype=float),
+            'yearly': lambda: np.array(state.years + ([np.expm1(state.year_growth)] if open_periods else []), dtype=float),
+        }
+        return evaluate_metrics(names, inputs, values)
+
+    def advance(self, returns):
+        """
+        Brings the accumulators up to date with the latest returns of the
+        series, committing every new day but the last, which becomes pending.
+
+        Returns:
+        - The updated accumulators, rebuilt from the whole series when the
+          series no longer extends the committed days.
+        """
+        committed, latest = returns.iloc[:-1], returns.iloc[-1:]
+        if self.last_date is not None and self.last_date in committed.index:
+            for date, value in committed[committed.index > self.last_date].items():
+                self.add(date, value)
+            state = self
+        else:
+            state = OnlineMetrics.from_returns(committed)
+        state.pending = (latest.index[0], float(latest.iloc[0])) if len(latest) else None
+        return state
+
+    def to_dict(self):
+        state = {field: getattr(self, field) for field in FIELDS}
+        state = {field: value.item() if isinstance(value, np.generic) else value for field, value in state.items()}
+        state['last_date'] = self.last_date.isoformat() if self.last_date is not None else None
+        state['pending'] = [self.pending[0].isoformat(), self.pending[1]] if self.pending is not None else None
+        return state
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        for field in FIELDS:
+            setattr(state, field, data[field])
+        state.last_date = pd.Timestamp(data['last_date']) if data['last_date'] else None
+        state.pending = (pd.Timestamp(data['pending'][0]), data['pending'][1]) if data['pending'] else None
+        return state
+
+if __name__ == '__main__':
+    from modules.returns_store import returns_store
+
+    parser = argparse.ArgumentParser(description='Print the metrics kept up to date in the returns store.')
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--metrics', nargs='+', default=ONLINE_METRICS, help='metrics to print, all by default')
+    args = parser.parse_args()
+
+    rows = {}
+    for symbol in args.symbols:
+        state = returns_store.read_state(symbol)
+        if state is not None:
+            rows[symbol.upper()] = state.metrics(args.metrics)
+    print(pd.DataFrame.from_dict(rows, orient='index', columns=args.metrics).T.to_string())
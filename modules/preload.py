@@ -0,0 +1,125 @@
+import argparse
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from modules import market_data
+from modules import qs_functions as qsf
+from modules.analytics_context import AnalyticsContext
+from modules.date_index import slice_dates
+from modules.returns_matrix import build_matrix
+from modules.returns_store import HAS_PARQUET
+
+logger = logging.getLogger(__name__)
+
+# Watchlist read at startup, see read_watchlist for the format
+WATCHLIST = os.environ.get('MM_WATCHLIST', 'watchlist.txt')
+
+# Benchmarks preloaded with every watchlist line that doesn't name its own
+DEFAULT_BENCHMARKS = os.environ.get('MM_PRELOAD_BENCHMARKS', 'SPY').split(',')
+
+PRELOAD_WORKERS = int(os.environ.get('MM_PRELOAD_WORKERS', 4))
+
+# Default date range of the report, in days back from today
+REPORT_DAYS = 5 * 365
+
+def read_watchlist(path=WATCHLIST):
+    """
+    Reads a watchlist file.
+
+    Each line holds a symbol optionally followed by its benchmarks, separated by
+    spaces or commas, e.g. 'MSFT SPY QQQ'. Blank lines and text after '#' are
+    ignored. Lines without benchmarks get DEFAULT_BENCHMARKS.
+
+    Returns:
+    - A list of (symbol, benchmark_symbols) tuples.
+    """
+    watchlist = []
+    with open(path) as f:
+        for line in f:
+            symbols = line.split('#', 1)[0].replace(',', ' ').split()
+            if symbols:
+                watchlist.append((symbols[0], symbols[1:] or DEFAULT_BENCHMARKS))
+    return watchlist
+
+def warm_report(symbol, benchmark_symbols):
+    """
+    Computes the report's metrics table and main graphs for a symbol over the
+    default date range, alone and against each benchmark, so they are served
+    from the memo cache when a user opens them.
+
+    The calls match the ones main_mvp makes, the memo keys on the arguments.
+    """
+    end = date.today()
+    start = end - timedelta(days=REPORT_DAYS)
+    for benchmark_symbol in [None, *benchmark_symbols]:
+        stock, benchmarks = market_data.fetch_returns(symbol, [benchmark_symbol] if benchmark_symbol else [])
+        stock = slice_dates(stock, start, end)
+        benchmark = slice_dates(benchmarks[0], start, end) if benchmark_symbol else None
+        if stock.empty or (benchmark is not None and benchmark.empty):
+            continue
+
+        # One context, so the graphs reuse the prices, drawdown and monthly
+        # returns computed for the metrics
+        context = AnalyticsContext(stock, symbol, benchmark, benchmark_symbol)
+        qsf.key_metrics(stock, symbol, benchmark_symbol, benchmark, context)
+        qsf.plot_earnings(stock, symbol, benchmark, benchmark_symbol, context)
+        qsf.plot_drawdown(stock, context)
+        qsf.plot_monthly_heatmap(stock, context)
+
+def _preload_line(symbol, benchmark_symbols, report):
+    try:
+        market_data.fetch_returns(symbol, benchmark_symbols)
+        if report:
+            warm_report(symbol, benchmark_symbols)
+    except Exception:
+        logger.exception('Failed to preload %s', symbol)
+
+def preload(watchlist, report=True, pack=False):
+    """
+    Loads every symbol and benchmark of a watchlist into the shared cache and
+    the on-disk store, and optionally warms their default report and packs
+    the store into the returns matrix.
+
+    Parameters:
+    - watchlist: A list of (symbol, benchmark_symbols) tuples.
+    - report: Whether to compute the default report of every line, see
+      warm_report. It is only useful inside the app's process.
+    - pack: Whether to rebuild the returns matrix afterwards. Only the CLI
+      does, so app processes starting together don't all rebuild it.
+    """
+    with ThreadPoolExecutor(max_workers=PRELOAD_WORKERS, thread_name_prefix='preload') as executor:
+        for symbol, benchmark_symbols in watchlist:
+            executor.submit(_preload_line, symbol, benchmark_symbols, report)
+
+    # Other worker processes pick the fresh data up through the matrix
+    if pack and market_data.provider.remote and HAS_PARQUET:
+        build_matrix()
+
+    logger.info('Preloaded %d watchlist symbols', len(watchlist))
+
+_started = False
+_started_lock = threading.Lock()
+
+def start_preload(path=WATCHLIST):
+    """
+    Preloads the watchlist in a background thread, once per process. Does
+    nothing if the watchlist file doesn't exist.
+    """
+    global _started
+    with _started_lock:
+        if _started or not os.path.exists(path):
+            return
+        _started = True
+
+    thread = threading.Thread(target=preload, args=(read_watchlist(path),), name='preload', daemon=True)
+    thread.start()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Warm the returns store and matrix for a watchlist.')
+    parser.add_argument('watchlist', nargs='?', default=WATCHLIST)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    preload(read_watchlist(args.watchlist), report=False, pack=True)
@@ -0,0 +1,151 @@
+import importlib
+import os
+import zlib
+import numpy as np
+import pandas as pd
+import quantstats as qs
+from modules.returns_store import check_symbol
+
+class ReturnsProvider:
+    """
+    Source of daily returns used by the app.
+
+    Providers implement download_returns with the same signature as
+    qs.utils.download_returns, so they can be used anywhere that function is.
+    """
+
+    # Whether downloads are slow and rate limited, and so worth keeping in the
+    # on-disk returns store
+    remote = True
+
+    def download_returns(self, symbol, period='max'):
+        """
+        Returns the daily returns of a symbol as a pandas Series indexed by date,
+        or an empty Series if the symbol is unknown.
+
+        Parameters:
+        - symbol: The ticker symbol.
+        - period: 'max' for the whole history, or a DatetimeIndex whose first
+          date is the first day to return.
+        """
+        raise NotImplementedError
+
+class YahooProvider(ReturnsProvider):
+    """
+    Downloads returns from Yahoo Finance through quantstats.
+    """
+
+    def download_returns(self, symbol, period='max'):
+        return qs.utils.download_returns(symbol, period=period)
+
+def _from_period(returns, period):
+    # Apply the start date of a DatetimeIndex period like quantstats does
+    if isinstance(period, pd.DatetimeIndex):
+        returns = returns[returns.index >= period[0]]
+    return returns
+
+class LocalFileProvider(ReturnsProvider):
+    """
+    Reads returns from a directory with one CSV or Parquet file per symbol.
+
+    Files are named after the symbol (MSFT.csv, MSFT.parquet) and indexed by
+    date. A 'Returns' or symbol column is used as is, otherwise an 'Adj Close' or
+    'Close' column is converted from prices to returns.
+
+    Parameters:
+    - directory: The directory holding the files.
+    """
+
+    remote = False
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _read(self, symbol):
+        # Symbols come from user input, never let them name a file elsewhere
+        check_symbol(symbol)
+        for name in (symbol.upper(), symbol):
+            path = os.path.join(self.directory, f'{name}.parquet')
+            if os.path.exists(path):
+                return pd.read_parquet(path)
+            path = os.path.join(self.directory, f'{name}.csv')
+            if os.path.exists(path):
+                return pd.read_csv(path, index_col=0, parse_dates=True)
+        return None
+
+    def download_returns(self, symbol, period='max'):
+        frame = self._read(symbol)
+        if frame is None:
+            return pd.Series(dtype=float, name=symbol.upper())
+
+        columns = {str(col).lower(): col for col in frame.columns}
+        for name in ('returns', symbol.lower()):
+            if name in columns:
+                returns = frame[columns[name]]
+                break
+        else:
+            # Adjusted prices first, as online with auto_adjust, so splits aren't returns
+            prices = frame[columns.get('adj close', columns.get('close', frame.columns[0]))]
+            returns = prices.pct_change().fillna(0)
+
+        returns = returns.astype(float).rename(symbol.upper())
+        returns.index = pd.DatetimeIndex(returns.index).tz_localize(None)
+        returns.index.name = 'Date'
+        return _from_period(returns, period)
+
+class SyntheticProvider(ReturnsProvider):
+    """
+    Generates deterministic random returns in memory, for offline runs,
+    benchmarks and load tests.
+
+    Every symbol gets its own reproducible series of normally distributed
+    business day returns.
+
+    Parameters:
+    - start: The first date of every series.
+    - end: The last date of every series, today if None.
+    - mu: The mean daily return.
+    - sigma: The standard deviation of daily returns.
+    - seed: Base seed mixed with the symbol name.
+    """
+
+    remote = False
+
+    def __init__(self, start='1987-01-01', end=None, mu=0.0004, sigma=0.015, seed=0):
+        self.start = start
+        self.end = end
+        self.mu = mu
+        self.sigma = sigma
+        self.seed = seed
+        self._series = {}
+
+    def download_returns(self, symbol, period='max'):
+        key = symbol.upper()
+        if key not in self._series:
+            dates = pd.bdate_range(self.start, self.end or pd.Timestamp.today().normalize(), name='Date')
+            rng = np.random.default_rng([self.seed, zlib.crc32(key.encode())])
+            self._series[key] = pd.Series(rng.normal(self.mu, self.sigma, len(dates)), index=dates, name=key)
+        return _from_period(self._series[key], period)
+
+def get_provider(name=None):
+    """
+    Creates the provider configured for the app.
+
+    Parameters:
+    - name: 'yahoo', 'local', 'synthetic' or a 'package.module:ClassName' path to a
+      custom ReturnsProvider. Defaults to the MM_DATA_PROVIDER environment
+      variable, then 'yahoo'. The local provider reads MM_DATA_DIR.
+    """
+    name = name or os.environ.get('MM_DATA_PROVIDER', 'yahoo')
+
+    if name == 'yahoo':
+        return YahooProvider()
+    if name == 'local':
+        return LocalFileProvider(os.environ.get('MM_DATA_DIR', 'data/local'))
+    if name == 'synthetic':
+        return SyntheticProvider()
+
+    if ':' not in name:
+        raise ValueError(f"Unknown data provider '{name}'")
+    module_name, class_name = name.split(':', 1)
+    return getattr(importlib.import_module(module_name), class_name)()
@@ -1,28 +1,63 @@
 import numpy as np
-import quantstats as qs
 import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs
 from scipy.stats import norm
 import pandas as pd
 import streamlit as st
+from modules.analytics_context import ensure_context
+from modules.memo import memoize
+from modules.metrics_kernel import KEY_METRICS
+from modules.rolling import ROLLING_WINDOW
+from modules.streaks import streak_summary
 
 def max_consecutive(returns, win=True):
-    # Convert returns to binary win/loss
-    binary = returns > 0 if win else returns < 0
+    """
+    Returns the length of the longest streak of gains, or of losses if win is False.
+    """
+    return streak_summary(returns)['win' if win else 'loss']['longest']
 
-    # Find where the streaks of wins/losses start
-    streak_starts = (~binary).shift(-1).fillna(False) & binary
+def format_drawdown_episodes(episodes):
+    """
+    Formats the output of drawdowns.drawdown_episodes for the drawdown tables.
+    """
+    return pd.DataFrame({
+        'start date': episodes['start'].dt.strftime('%m/%d/%Y'),
+        'end date': episodes['end'].dt.strftime('%m/%d/%Y'),
+        'valley date': episodes['valley'].dt.strftime('%m/%d/%Y'),
+        'Days': episodes['days'],
+        'drawdown %': (episodes['max drawdown'] * 100).round(2),  # round to 2 decimal places
+        '99% max drawdown %': (episodes['99% max drawdown'] * 100).round(2)  # round to 2 decimal places
+    })
+
+def format_table(frame, columns, scale=1, date_format='%m/%d/%Y'):
+    """
+    Formats a date-indexed DataFrame for display, the dates are only turned
+    into text here, after all the joins.
 
-    # Find where the streaks of wins/losses end
-    streak_ends = binary.shift(-1).fillna(False) & (~binary)
+    Parameters:
+    - frame: A DataFrame indexed by date.
+    - columns: The names to show for its columns.
+    - scale: A factor applied to the values before rounding to 2 decimals (e.g. 100 for percentages).
+    - date_format: The strftime format of the dates, None to show the year only.
 
-    # Calculate the length of each streak
-    streak_lengths = (streak_ends.cumsum() - streak_starts.cumsum()).max()
+    Returns:
+    - A DataFrame with a 'Date' column followed by the values.
+    """
+    table = (frame * scale).round(2)
+    table.columns = columns
+    table = table.rename_axis('Date').reset_index()
+    table['Date'] = table['Date'].dt.strftime(date_format) if date_format else table['Date'].dt.year
+    return table
 
-    return streak_lengths
+def table_columns(context, symbol, benchmark_symbol):
+    # Display names of the columns of context.frame()
+    return [symbol, benchmark_symbol] if context.benchmark is not None else [symbol]
 
 def export_data(graphs, tables, symbol):
-    # Convert all tables and graphs to HTML and join them
+    # Convert all tables and graphs to HTML and join them, the graphs share one copy of plotly.js
     graphs_html = ''.join([f'<div class="graph">{graph}</div>' for graph in graphs.values()])
+    if graphs:
+        graphs_html = f'<script type="text/javascript">{get_plotlyjs()}</script>' + graphs_html
     tables_html = ''.join([f'<div class="table"><h2>{name}</h2>{df.to_html(border=0, index=False)}</div>' for name, df in tables.items()])
     html = f'<h1>{symbol} Custom Report</h1><div class="container"><div class="graphs">{graphs_html}</div><div class="tables">{tables_html}</div></div>'
 
@@ -78,6 +113,7 @@ def export_data(graphs, tables, symbol):
 
 ############GRAPHS################
 
+@memoize
 def plot_daily_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'):
     """
     Plots daily returns for a given stock and optionally compares it with a benchmark data.
@@ -105,6 +141,7 @@ def plot_daily_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmar
 
     return fig
 
+@memoize
 def plot_distribution(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'):
     # Convert returns to percentages
     stock_percentage = stock * 100
@@ -167,21 +204,14 @@ def plot_distribution(stock, symbol, benchmark=None, benchmark_symbol='Benchmark
 
     return fig
 
-def plot_drawdown(stock):
+@memoize
+def plot_drawdown(stock, context=None):
     
     """
     Plots the drawdown of returns for a given stock.
     """
-    # Drop NaN values
-    stock = stock.dropna()
-
-    # Convert returns data into prices
-    prices = (1 + stock).cumprod()
-
-    # Calculate drawdown series
-    drawdown_series = prices / np.maximum.accumulate(prices) - 1.0
-    drawdown_series = drawdown_series.replace([np.inf, -np.inf, -0], 0)
-    drawdown_series = drawdown_series.rename('drawdown')
+    # Get the drawdown series from the shared analytics context
+    drawdown_series = ensure_context(context, stock).stock.drawdown
 
     # Convert drawdown series to DataFrame
     drawdown_df = pd.DataFrame(drawdown_series)
@@ -234,86 +264,59 @@ def plot_drawdown(stock):
                     showlegend=False)
     return fig
 
-def plot_drawdowns_periods(stock):
+@memoize
+def plot_drawdowns_periods(stock, context=None):
     """
     Plots the drawdowns periods of returns for a given stock.
     """
-    
-# Drop NaN values
-    stock = stock.dropna()
-
-    # Convert returns data into prices
-    prices = (1 + stock).cumprod()
-
-    # Calculate drawdown series
-    drawdown_series = prices / np.maximum.accumulate(prices) - 1.0
-    drawdown_series = drawdown_series.replace([np.inf, -np.inf, -0], 0)
-    drawdown_series = drawdown_series.rename('drawdown')
-
-    # Convert drawdown series to DataFrame
-    drawdown_df = pd.DataFrame(drawdown_series)
-
-    # Reset index to get 'Date' as a column
-    drawdown_df = drawdown_df.reset_index()
-
-    # Your provided calculations for drawdowns
-    drawdown_df = drawdown_df.copy()  # assuming drawdown_df is already defined
-
-    # Identify the start of drawdown periods
-    drawdown_start = (drawdown_df['drawdown'] < 0) & (drawdown_df['drawdown'].shift() >= 0)
-
-    # Identify drawdown periods
-    drawdown_df['drawdown_period'] = drawdown_start.cumsum()
-
-    # Calculate min drawdown for each period
-    drawdown_periods = drawdown_df.groupby('drawdown_period')['drawdown'].min()
+    context = ensure_context(context, stock)
 
-    # Get the 5 worst drawdown periods
-    worst_periods = drawdown_periods.nsmallest(5).index
-
-    # Get start and end dates for the worst periods
-    worst_periods_df = drawdown_df[drawdown_df['drawdown_period'].isin(worst_periods)]
-    start_end_dates = worst_periods_df.groupby('drawdown_period')['Date'].agg(['first', 'last'])
+    # Get the 5 worst drawdown episodes from the shared drawdown engine
+    worst_episodes = context.stock.drawdown_episodes.nsmallest(5, 'max drawdown').sort_index()
     
-    earnings_data = (1 + stock).cumprod()
+    earnings_data = context.stock.clean_prices
     # Your provided code for earnings graph
     fig = go.Figure(data=go.Scatter(x=earnings_data.index, y=earnings_data, mode='lines'))
 
     # Add rectangles for the 5 worst drawdown periods
-    for _, row in start_end_dates.iterrows():
+    for _, row in worst_episodes.iterrows():
         fig.add_shape(
             type="rect",
             xref="x", yref="paper",
-            x0=row['first'], y0=0, x1=row['last'], y1=1,
+            x0=row['start'], y0=0, x1=row['end'], y1=1,
             fillcolor="red", opacity=0.5, layer="below", line_width=0
         )
 
     fig.update_layout(title='Earnings with Worst Drawdown Periods', xaxis_title='Date', yaxis_title='Cumulative Returns')
     return fig
 
-def plot_earnings(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'):
+@memoize
+def plot_earnings(stock, symbol, benchmark=None, benchmark_symbol='Benchmark', context=None):
     """
     Plots the earnings of returns for a given stock.
     Note: This function assumes 'stock' contains earnings data.
     """
+    context = ensure_context(context, stock, benchmark)
+
     # Convert returns to growth of $1 investment over time
-    earnings_data = (1 + stock).cumprod()
+    earnings_data = context.stock.prices
     # Plot the earnings
     fig = go.Figure(data=go.Scatter(x=earnings_data.index, y=earnings_data, mode='lines', name=symbol))
 
     # If a benchmark is provided, plot it as well
     if benchmark is not None:
         
-        benchmark_data = (1 + benchmark).cumprod()
+        benchmark_data = context.benchmark.prices
         fig.add_trace(go.Scatter(x=benchmark_data.index, y=benchmark_data, mode='lines', name=benchmark_symbol, line=dict(color='red')))
 
     fig.update_layout(title='Earnings', xaxis_title='Date', yaxis_title='Value of $1')
     return fig
 
-def plot_monthly_dist(stock):
+@memoize
+def plot_monthly_dist(stock, context=None):
     
     # Convert daily returns to monthly returns
-    stock_monthly = stock.resample('M').apply(lambda x: (1 + x).prod() - 1)
+    stock_monthly = ensure_context(context, stock).stock.monthly
 
     # Convert returns to percentages
     stock_percentage = stock_monthly * 100
@@ -363,7 +366,8 @@ def plot_monthly_dist(stock):
     fig.add_trace(go.Scatter(x=x, y=pdf, mode='lines', name='Distribution'))
     return fig
 
-def plot_log_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'):
+@memoize
+def plot_log_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmark', context=None):
     """
     Plots the log returns of a given stock and optionally compares it with a benchmark data.
 
@@ -376,12 +380,14 @@ def plot_log_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'
     - A Plotly figure displaying the daily returns.
     """
     
+    context = ensure_context(context, stock, benchmark)
+
     # Calculate cumulative returns
-    stock_cumulative_returns = (1 + stock).cumprod() * 100
+    stock_cumulative_returns = context.stock.prices * 100
     benchmark_cumulative_returns = None
 
     if benchmark is not None:
-        benchmark_cumulative_returns = (1 + benchmark).cumprod() * 100
+        benchmark_cumulative_returns = context.benchmark.prices * 100
 
     # Create a Plotly figure
     fig = go.Figure()
@@ -402,12 +408,13 @@ def plot_log_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'
 
     return fig
 
-def plot_monthly_heatmap(stock):
+@memoize
+def plot_monthly_heatmap(stock, context=None):
     """
     Plots the monthly heatmap of returns for a given stock.
     """
     # Calculate monthly returns
-    monthly_returns = stock.resample('M').apply(lambda x: (1 + x).prod() - 1)
+    monthly_returns = ensure_context(context, stock).stock.monthly
 
     # Convert the index to a DatetimeIndex if it's not already
     if not isinstance(monthly_returns.index, pd.DatetimeIndex):
@@ -469,7 +476,8 @@ def plot_monthly_heatmap(stock):
 
     return fig
 
-def plot_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'):
+@memoize
+def plot_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmark', context=None):
     """
     Plots monthly returns for a given stock and optionally compares it with a benchmark data.
 
@@ -482,12 +490,14 @@ def plot_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'):
     - A Plotly figure displaying the monthly returns.
     """
     
+    context = ensure_context(context, stock, benchmark)
+
     # Calculate monthly returns
-    stock_monthly = stock.resample('M').apply(lambda x: (1 + x).prod() - 1)
+    stock_monthly = context.stock.monthly
     benchmark_monthly = None
 
     if benchmark is not None:
-        benchmark_monthly = benchmark.resample('M').apply(lambda x: (1 + x).prod() - 1)
+        benchmark_monthly = context.benchmark.monthly
 
     # Create a Plotly figure
     fig = go.Figure()
@@ -504,42 +514,64 @@ def plot_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'):
 
     return fig
 
-def plot_rolling_sharpe(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'):
+# Line styles telling the windows of a rolling graph apart
+WINDOW_DASHES = [None, 'dash', 'dot', 'dashdot']
+
+def rolling_label(name, window, windows):
+    # Name lines and columns by window only when several windows are shown
+    return name if len(windows) == 1 else f'{name} ({window}d)'
+
+def plot_rolling(context, stat, title, symbol, benchmark_symbol, windows):
     """
-    Plots the rolling Sharpe ratio of a given stock and optionally compares it with a benchmark data.
+    Plots one rolling statistic of the stock, and of the benchmark if the
+    context has one, for every window length.
 
     Parameters:
-    - stock: A pandas DataFrame containing the daily returns for the stock.
-    - benchmark: A pandas DataFrame containing the daily returns for the benchmark (optional).
-    - benchmark_symbol: A string representing the ticker symbol of the benchmark (default is 'SPY').
+    - context: The AnalyticsContext of the stock and benchmark.
+    - stat: The statistic to plot, one of rolling.ROLLING_STATS.
+    - title: The title of the graph.
+    - symbol: The symbol of the stock.
+    - benchmark_symbol: The symbol of the benchmark.
+    - windows: The window lengths in trading days.
 
     Returns:
-    - A Plotly figure displaying the rolling Sharpe ratio.
+    - A Plotly figure with one line per series and window.
     """
-    
-    # Calculate rolling Sharpe ratio
-    rolling_sharpe = qs.stats.rolling_sharpe(stock)
-    benchmark_rolling_sharpe = None
-
-    if benchmark is not None:
-        benchmark_rolling_sharpe = qs.stats.rolling_sharpe(benchmark)
-
-    # Create a Plotly figure
     fig = go.Figure()
 
-    # Add a scatter trace for the rolling Sharpe ratio data
-    fig.add_trace(go.Scatter(x=rolling_sharpe.index, y=rolling_sharpe, mode='lines', name=symbol, line=dict(color='blue')))
-
-    # Add a scatter trace for the benchmark rolling Sharpe ratio data if provided
-    if benchmark is not None:
-        fig.add_trace(go.Scatter(x=benchmark_rolling_sharpe.index, y=benchmark_rolling_sharpe, mode='lines', name=benchmark_symbol, line=dict(color='red')))
+    # One line per window, the stock in blue and the benchmark in red
+    for analytics, name, color in [(context.stock, symbol, 'blue'), (context.benchmark, benchmark_symbol, 'red')]:
+        if analytics is None:
+            continue
+        rolling = analytics.rolling(windows)[stat]
+        for i, window in enumerate(windows):
+            dash = WINDOW_DASHES[i % len(WINDOW_DASHES)]
+            fig.add_trace(go.Scatter(x=rolling.index, y=rolling[window], mode='lines', name=rolling_label(name, window, windows), line=dict(color=color, dash=dash)))
 
     # Add title to the graph
-    fig.update_layout(title_text='Rolling Sharpe Ratio')
+    fig.update_layout(title_text=title)
 
     return fig
 
-def plot_rolling_sortino(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'):
+@memoize
+def plot_rolling_sharpe(stock, symbol, benchmark=None, benchmark_symbol='Benchmark', context=None, windows=(ROLLING_WINDOW,)):
+    """
+    Plots the rolling Sharpe ratio of a given stock and optionally compares it with a benchmark data.
+
+    Parameters:
+    - stock: A pandas DataFrame containing the daily returns for the stock.
+    - benchmark: A pandas DataFrame containing the daily returns for the benchmark (optional).
+    - benchmark_symbol: A string representing the ticker symbol of the benchmark (default is 'SPY').
+    - windows: The window lengths in trading days, one line each (default is 6 months).
+
+    Returns:
+    - A Plotly figure displaying the rolling Sharpe ratio.
+    """
+    context = ensure_context(context, stock, benchmark)
+    return plot_rolling(context, 'sharpe', 'Rolling Sharpe Ratio', symbol, benchmark_symbol, windows)
+
+@memoize
+def plot_rolling_sortino(stock, symbol, benchmark=None, benchmark_symbol='Benchmark', context=None, windows=(ROLLING_WINDOW,)):
     """
     Plots the rolling Sortino ratio of a given stock and optionally compares it with a benchmark data.
 
@@ -547,69 +579,120 @@ def plot_rolling_sortino(stock, symbol, benchmark=None, benchmark_symbol='Benchm
     - stock: A pandas DataFrame containing the daily returns for the stock.
     - benchmark: A pandas DataFrame containing the daily returns for the benchmark (optional).
     - benchmark_symbol: A string representing the ticker symbol of the benchmark (default is 'SPY').
+    - windows: The window lengths in trading days, one line each (default is 6 months).
 
     Returns:
     - A Plotly figure displaying the rolling Sortino ratio.
     """
-    
-    # Calculate rolling Sortino ratio
-    rolling_sortino = qs.stats.rolling_sortino(stock)
-    benchmark_rolling_sortino = None
+    context = ensure_context(context, stock, benchmark)
+    return plot_rolling(context, 'sortino', 'Rolling Sortino Ratio', symbol, benchmark_symbol, windows)
 
-    if benchmark is not None:
-        benchmark_rolling_sortino = qs.stats.rolling_sortino(benchmark)
+@memoize
+def plot_rolling_volatility(stock, symbol, benchmark=None, benchmark_symbol='Benchmark', context=None, windows=(ROLLING_WINDOW,)):
+    """
+    Plots the rolling volatility of a given stock and optionally compares it with a benchmark data.
+
+    Parameters:
+    - stock: A pandas DataFrame containing the daily returns for the stock.
+    - benchmark: A pandas DataFrame containing the daily returns for the benchmark (optional).
+    - benchmark_symbol: A string representing the ticker symbol of the benchmark (default is 'SPY').
+    - windows: The window lengths in trading days, one line each (default is 6 months).
+
+    Returns:
+    - A Plotly figure displaying the rolling volatility.
+    """
+    context = ensure_context(context, stock, benchmark)
+    return plot_rolling(context, 'volatility', 'Rolling Volatility', symbol, benchmark_symbol, windows)
+
+def plot_rolling_benchmark(stock, symbol, benchmark, benchmark_symbol, context, windows, stat, title):
+    """
+    Plots one rolling statistic of the stock against the benchmark, one line
+    per window, or returns None without a benchmark.
+    """
+    if benchmark is None:
+        return None
+    context = ensure_context(context, stock, benchmark)
+    rolling = context.benchmark_rolling(windows)[stat]
 
     # Create a Plotly figure
     fig = go.Figure()
 
-    # Add a scatter trace for the rolling Sortino ratio data
-    fig.add_trace(go.Scatter(x=rolling_sortino.index, y=rolling_sortino, mode='lines', name=symbol, line=dict(color='blue')))
-
-    # Add a scatter trace for the benchmark rolling Sortino ratio data if provided
-    if benchmark is not None:
-        fig.add_trace(go.Scatter(x=benchmark_rolling_sortino.index, y=benchmark_rolling_sortino, mode='lines', name=benchmark_symbol, line=dict(color='red')))
+    # One line per window
+    for i, window in enumerate(windows):
+        dash = WINDOW_DASHES[i % len(WINDOW_DASHES)]
+        fig.add_trace(go.Scatter(x=rolling.index, y=rolling[window], mode='lines', name=rolling_label(symbol, window, windows), line=dict(color='blue', dash=dash)))
 
     # Add title to the graph
-    fig.update_layout(title_text='Rolling Sortino Ratio')
+    fig.update_layout(title_text=f'{title} vs {benchmark_symbol}')
 
     return fig
 
-def plot_rolling_volatility(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'):
+@memoize
+def plot_rolling_beta(stock, symbol, benchmark=None, benchmark_symbol='Benchmark', context=None, windows=(ROLLING_WINDOW,)):
     """
-    Plots the rolling volatility of a given stock and optionally compares it with a benchmark data.
+    Plots the rolling beta of a given stock to the benchmark.
 
     Parameters:
     - stock: A pandas DataFrame containing the daily returns for the stock.
-    - benchmark: A pandas DataFrame containing the daily returns for the benchmark (optional).
+    - benchmark: A pandas DataFrame containing the daily returns for the benchmark.
     - benchmark_symbol: A string representing the ticker symbol of the benchmark (default is 'SPY').
+    - windows: The window lengths in trading days, one line each (default is 6 months).
 
     Returns:
-    - A Plotly figure displaying the rolling volatility.
+    - A Plotly figure displaying the rolling beta, None without a benchmark.
     """
-    
-    # Calculate rolling volatility
-    rolling_volatility = qs.stats.rolling_volatility(stock)
-    benchmark_rolling_volatility = None
+    return plot_rolling_benchmark(stock, symbol, benchmark, benchmark_symbol, context, windows, 'beta', 'Rolling Beta')
 
-    if benchmark is not None:
-        benchmark_rolling_volatility = qs.stats.rolling_volatility(benchmark)
+@memoize
+def plot_rolling_alpha(stock, symbol, benchmark=None, benchmark_symbol='Benchmark', context=None, windows=(ROLLING_WINDOW,)):
+    """
+    Plots the rolling annualized alpha of a given stock over the benchmark.
 
-    # Create a Plotly figure
-    fig = go.Figure()
+    Parameters:
+    - stock: A pandas DataFrame containing the daily returns for the stock.
+    - benchmark: A pandas DataFrame containing the daily returns for the benchmark.
+    - benchmark_symbol: A string representing the ticker symbol of the benchmark (default is 'SPY').
+    - windows: The window lengths in trading days, one line each (default is 6 months).
 
-    # Add a scatter trace for the rolling volatility data
-    fig.add_trace(go.Scatter(x=rolling_volatility.index, y=rolling_volatility, mode='lines', name=symbol, line=dict(color='blue')))
+    Returns:
+    - A Plotly figure displaying the rolling alpha, None without a benchmark.
+    """
+    return plot_rolling_benchmark(stock, symbol, benchmark, benchmark_symbol, context, windows, 'alpha', 'Rolling Alpha (ann.)')
 
-    # Add a scatter trace for the benchmark rolling volatility data if provided
-    if benchmark is not None:
-        fig.add_trace(go.Scatter(x=benchmark_rolling_volatility.index, y=benchmark_rolling_volatility, mode='lines', name=benchmark_symbol, line=dict(color='red')))
+@memoize
+def plot_rolling_correlation(stock, symbol, benchmark=None, benchmark_symbol='Benchmark', context=None, windows=(ROLLING_WINDOW,)):
+    """
+    Plots the rolling correlation of a given stock with the benchmark.
 
-    # Add title to the graph
-    fig.update_layout(title_text='Rolling Volatility')
+    Parameters:
+    - stock: A pandas DataFrame containing the daily returns for the stock.
+    - benchmark: A pandas DataFrame containing the daily returns for the benchmark.
+    - benchmark_symbol: A string representing the ticker symbol of the benchmark (default is 'SPY').
+    - windows: The window lengths in trading days, one line each (default is 6 months).
 
-    return fig
+    Returns:
+    - A Plotly figure displaying the rolling correlation, None without a benchmark.
+    """
+    return plot_rolling_benchmark(stock, symbol, benchmark, benchmark_symbol, context, windows, 'correlation', 'Rolling Correlation')
+
+@memoize
+def plot_rolling_tracking_error(stock, symbol, benchmark=None, benchmark_symbol='Benchmark', context=None, windows=(ROLLING_WINDOW,)):
+    """
+    Plots the rolling annualized tracking error of a given stock against the benchmark.
+
+    Parameters:
+    - stock: A pandas DataFrame containing the daily returns for the stock.
+    - benchmark: A pandas DataFrame containing the daily returns for the benchmark.
+    - benchmark_symbol: A string representing the ticker symbol of the benchmark (default is 'SPY').
+    - windows: The window lengths in trading days, one line each (default is 6 months).
+
+    Returns:
+    - A Plotly figure displaying the rolling tracking error, None without a benchmark.
+    """
+    return plot_rolling_benchmark(stock, symbol, benchmark, benchmark_symbol, context, windows, 'tracking error', 'Rolling Tracking Error (ann.)')
 
-def plot_yearly_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmark'):
+@memoize
+def plot_yearly_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchmark', context=None):
     """
     Plots the yearly returns of a given stock and optionally compares it with a benchmark data.
 
@@ -622,12 +705,14 @@ def plot_yearly_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchma
     - A Plotly figure displaying the yearly returns.
     """
     
+    context = ensure_context(context, stock, benchmark)
+
     # Convert daily returns to yearly returns
-    stock_yearly = stock.resample('Y').apply(lambda x: (1 + x).prod() - 1)
+    stock_yearly = context.stock.yearly
     benchmark_yearly = None
 
     if benchmark is not None:
-        benchmark_yearly = benchmark.resample('Y').apply(lambda x: (1 + x).prod() - 1)
+        benchmark_yearly = context.benchmark.yearly
 
     # Create a Plotly figure
     fig = go.Figure()
@@ -651,7 +736,8 @@ def plot_yearly_returns(stock, symbol, benchmark=None, benchmark_symbol='Benchma
     return fig
 
 ######TABLES######
-def table_daily_returns(stock, symbol, benchmark_symbol=None, benchmark=None):
+@memoize
+def table_daily_returns(stock, symbol, benchmark_symbol=None, benchmark=None, context=None):
     """
     Prepares daily returns for a given stock and optionally compares it with a benchmark for AgGrid table.
 
@@ -661,29 +747,13 @@ def table_daily_returns(stock, symbol, benchmark_symbol=None, benchmark=None):
     - benchmark_symbol: The symbol of the benchmark (optional).
     - benchmark: A pandas DataFrame containing the daily returns for the benchmark (optional).
     """
-    
-    # Convert the stock data to a DataFrame and reset the index
-    df = pd.DataFrame(stock).reset_index()
+    context = ensure_context(context, stock, benchmark)
 
-    # Rename the columns
-    df.columns = ['Date', symbol]
-    # Format the 'Date' column to 'mm/dd/yyyy'
-    df['Date'] = df['Date'].dt.strftime('%m/%d/%Y')
+    # Daily returns in %, the stock and benchmark joined on their dates
+    return format_table(context.aligned, table_columns(context, symbol, benchmark_symbol), scale=100)
 
-    # Round 'Daily Returns' to 2 decimal places and convert to percentage
-    df[symbol] = (df[symbol] * 100).round(2)
-
-    # If benchmark is provided, prepare it separately and then merge it with the main DataFrame
-    if benchmark is not None:
-        benchmark_df = pd.DataFrame(benchmark).reset_index()
-        benchmark_df.columns = ['Date', benchmark_symbol]
-        benchmark_df['Date'] = benchmark_df['Date'].dt.strftime('%m/%d/%Y')
-        benchmark_df[benchmark_symbol] = (benchmark_df[benchmark_symbol] * 100).round(2)
-        df = df.merge(benchmark_df, on='Date', how='outer')
-
-    return df
-
-def table_drawdown(stock):
+@memoize
+def table_drawdown(stock, context=None):
     """
     Displays the drawdown of returns for a given stock as an AgGrid table.
 
@@ -691,95 +761,18 @@ def table_drawdown(stock):
     - stock: A pandas DataFrame containing the daily returns for the stock.
     """
     
-    # Drop NaN values
-    stock = stock.dropna()
-
-    # Convert returns data into prices
-    prices = (1 + stock).cumprod()
-
-    # Calculate drawdown series
-    drawdown_series = prices / np.maximum.accumulate(prices) - 1.0
-    drawdown_series = drawdown_series.replace([np.inf, -np.inf, -0], 0)
-    drawdown_series = drawdown_series.rename('drawdown')
-
-    # Mark periods with no drawdown
-    no_dd = drawdown_series == 0
-
-    # Convert no_dd to boolean type
-    no_dd = no_dd.astype(bool)
-
-    # Determine start and end dates of drawdown periods
-    starts = (~no_dd & no_dd.shift(1).fillna(False)).where(lambda x: x).dropna().index
-    ends = (no_dd & ~no_dd.shift(1).fillna(False)).where(lambda x: x).shift(-1, fill_value=False).dropna().index
-    # Handle case where series begins or ends with a drawdown
-    if starts[0] > ends[0]:
-        starts = starts.insert(0, drawdown_series.index[0])
-    if starts[-1] > ends[-1]:
-        ends = ends.append(pd.Index([drawdown_series.index[-1]]))
-
-    # Calculate drawdown details for each period
-    data = []
-    for start, end in zip(starts, ends):
-        dd = drawdown_series[start:end]
-        data.append({
-            'start date': start.strftime('%m/%d/%Y'),
-            'end date': end.strftime('%m/%d/%Y'),
-            'valley date': dd.idxmin().strftime('%m/%d/%Y'),
-            'Days': (end - start).days + 1,
-            'drawdown %': round(dd.min() * 100, 2),  # round to 2 decimal places
-            '99% max drawdown %': round(dd[dd > dd.quantile(0.01)].min() * 100, 2)  # round to 2 decimal places
-        })
-
-    # Create DataFrame from results
-    df = pd.DataFrame(data)
+    # Format the drawdown episodes of the shared drawdown engine for display
+    df = format_drawdown_episodes(ensure_context(context, stock).stock.drawdown_episodes)
 
     # Get the 5 worst drawdown periods
     df = df.nsmallest(5, 'drawdown %')
 
     return df
 
-def table_drawdowns_periods(stock):
-    # Drop NaN values
-    stock = stock.dropna()
-
-    # Convert returns data into prices
-    prices = (1 + stock).cumprod()
-
-    # Calculate drawdown series
-    drawdown_series = prices / np.maximum.accumulate(prices) - 1.0
-    drawdown_series = drawdown_series.replace([np.inf, -np.inf, -0], 0)
-    drawdown_series = drawdown_series.rename('drawdown')
-
-        # Mark periods with no drawdown
-    no_dd = drawdown_series == 0
-
-    # Convert no_dd to boolean type
-    no_dd = no_dd.astype(bool)
-
-    # Determine start and end dates of drawdown periods
-    starts = (~no_dd & no_dd.shift(1).fillna(False)).where(lambda x: x).dropna().index
-    ends = (no_dd & ~no_dd.shift(1).fillna(False)).where(lambda x: x).shift(-1, fill_value=False).dropna().index
-    # Handle case where series begins or ends with a drawdown
-    if starts[0] > ends[0]:
-        starts = starts.insert(0, drawdown_series.index[0])
-    if starts[-1] > ends[-1]:
-        ends = ends.append(pd.Index([drawdown_series.index[-1]]))
-
-        # Calculate drawdown details for each period
-    data = []
-    for start, end in zip(starts, ends):
-        dd = drawdown_series[start:end]
-        data.append({
-            'start date': start.strftime('%m/%d/%Y'),
-            'end date': end.strftime('%m/%d/%Y'),
-            'valley date': dd.idxmin().strftime('%m/%d/%Y'),
-            'Days': (end - start).days + 1,
-            'drawdown %': round(dd.min() * 100, 2),  # round to 2 decimal places
-            '99% max drawdown %': round(dd[dd > dd.quantile(0.01)].min() * 100, 2)  # round to 2 decimal places
-        })
-
-    # Create DataFrame from results
-    df = pd.DataFrame(data)
+@memoize
+def table_drawdowns_periods(stock, context=None):
+    # Format the drawdown episodes of the shared drawdown engine for display
+    df = format_drawdown_episodes(ensure_context(context, stock).stock.drawdown_episodes)
 
     # Get the 10 worst drawdown periods
     df = df.nsmallest(10, 'drawdown %')
@@ -788,259 +781,123 @@ def table_drawdowns_periods(stock):
     return df
     
 
-def table_earnings(stock, symbol, benchmark_symbol=None, benchmark=None):
-    earnings_data = (1 + stock).cumprod()
-    earnings_df = earnings_data.reset_index()
-    earnings_df.columns = ['Date', symbol]
-    earnings_df['Date'] = earnings_df['Date'].dt.strftime('%m/%d/%Y')
-    earnings_df[symbol] = earnings_df[symbol].round(2)
-
-    if benchmark is not None:
-        benchmark_earnings_data = (1 + benchmark).cumprod()
-        benchmark_earnings_df = benchmark_earnings_data.reset_index()
-        benchmark_earnings_df.columns = ['Date', benchmark_symbol]
-        benchmark_earnings_df['Date'] = benchmark_earnings_df['Date'].dt.strftime('%m/%d/%Y')
-        benchmark_earnings_df[benchmark_symbol] = benchmark_earnings_df[benchmark_symbol].round(2)
-
-        earnings_df = earnings_df.merge(benchmark_earnings_df, on='Date', how='outer')
-
-    return earnings_df
-
-def table_monthly_earnings(stock, symbol, benchmark_symbol=None, benchmark=None):
-    earnings_data = (1 + stock.resample('M').apply(lambda x: (1 + x).prod() - 1)).cumprod()
-    earnings_df = earnings_data.reset_index()
-    earnings_df.columns = ['Date', symbol]
-    earnings_df['Date'] = earnings_df['Date'].dt.strftime('%m/%d/%Y')
-    earnings_df[symbol] = earnings_df[symbol].round(2)
-
-    if benchmark is not None:
-        benchmark_earnings_data = (1 + benchmark.resample('M').apply(lambda x: (1 + x).prod() - 1)).cumprod()
-        benchmark_earnings_df = benchmark_earnings_data.reset_index()
-        benchmark_earnings_df.columns = ['Date', benchmark_symbol]
-        benchmark_earnings_df['Date'] = benchmark_earnings_df['Date'].dt.strftime('%m/%d/%Y')
-        benchmark_earnings_df[benchmark_symbol] = benchmark_earnings_df[benchmark_symbol].round(2)
-
-        earnings_df = earnings_df.merge(benchmark_earnings_df, on='Date', how='outer')
-
-    return earnings_df
+@memoize
+def table_earnings(stock, symbol, benchmark_symbol=None, benchmark=None, context=None):
+    context = ensure_context(context, stock, benchmark)
+    return format_table(context.frame('prices'), table_columns(context, symbol, benchmark_symbol))
 
-def table_yearly_earnings(stock, symbol, benchmark_symbol=None, benchmark=None):
-    earnings_data = (1 + stock.resample('Y').apply(lambda x: (1 + x).prod() - 1)).cumprod()
-    earnings_df = earnings_data.reset_index()
-    earnings_df.columns = ['Date', symbol]
-    earnings_df['Date'] = earnings_df['Date'].dt.strftime('%m/%d/%Y')
-    earnings_df[symbol] = earnings_df[symbol].round(2)
-
-    if benchmark is not None:
-        benchmark_earnings_data = (1 + benchmark.resample('Y').apply(lambda x: (1 + x).prod() - 1)).cumprod()
-        benchmark_earnings_df = benchmark_earnings_data.reset_index()
-        benchmark_earnings_df.columns = ['Date', benchmark_symbol]
-        benchmark_earnings_df['Date'] = benchmark_earnings_df['Date'].dt.strftime('%m/%d/%Y')
-        benchmark_earnings_df[benchmark_symbol] = benchmark_earnings_df[benchmark_symbol].round(2)
+@memoize
+def table_monthly_earnings(stock, symbol, benchmark_symbol=None, benchmark=None, context=None):
+    context = ensure_context(context, stock, benchmark)
+    return format_table(context.frame('monthly_prices'), table_columns(context, symbol, benchmark_symbol))
 
-        earnings_df = earnings_df.merge(benchmark_earnings_df, on='Date', how='outer')
-
-    return earnings_df
-
-def table_returns(stock, symbol, benchmark_symbol=None, benchmark=None):
-    stock_monthly = stock.resample('M').apply(lambda x: (1 + x).prod() - 1)
-    stock_monthly_df = stock_monthly.reset_index()
-    stock_monthly_df.columns = ['Date', symbol]
-    stock_monthly_df[symbol] = (stock_monthly_df[symbol] * 100).round(2)
-    stock_monthly_df['Date'] = stock_monthly_df['Date'].dt.strftime('%m/%d/%Y')
-
-    if benchmark is not None:
-        benchmark_monthly = benchmark.resample('M').apply(lambda x: (1 + x).prod() - 1)
-        benchmark_monthly_df = benchmark_monthly.reset_index()
-        benchmark_monthly_df.columns = ['Date', benchmark_symbol]
-        benchmark_monthly_df[benchmark_symbol] = (benchmark_monthly_df[benchmark_symbol] * 100).round(2)
-        benchmark_monthly_df['Date'] = benchmark_monthly_df['Date'].dt.strftime('%m/%d/%Y')
+@memoize
+def table_yearly_earnings(stock, symbol, benchmark_symbol=None, benchmark=None, context=None):
+    context = ensure_context(context, stock, benchmark)
+    return format_table(context.frame('yearly_prices'), table_columns(context, symbol, benchmark_symbol))
 
-        stock_monthly_df = stock_monthly_df.merge(benchmark_monthly_df, on='Date', how='outer')
+@memoize
+def table_returns(stock, symbol, benchmark_symbol=None, benchmark=None, context=None):
+    context = ensure_context(context, stock, benchmark)
+    return format_table(context.frame('monthly'), table_columns(context, symbol, benchmark_symbol), scale=100)
 
-    return stock_monthly_df
-
-def table_rolling_sharpe(stock, symbol, benchmark_symbol=None, benchmark=None):
-    rolling_sharpe = qs.stats.rolling_sharpe(stock)
-    rolling_sharpe.dropna(inplace=True)
-    rolling_sharpe_df = rolling_sharpe.reset_index()
-    rolling_sharpe_df.columns = ['Date', symbol]
-    rolling_sharpe_df[symbol] = rolling_sharpe_df[symbol].round(2)
-    rolling_sharpe_df['Date'] = rolling_sharpe_df['Date'].dt.strftime('%m/%d/%Y')
-
-    if benchmark is not None:
-        benchmark_rolling_sharpe = qs.stats.rolling_sharpe(benchmark)
-        benchmark_rolling_sharpe.dropna(inplace=True)
-        benchmark_rolling_sharpe_df = benchmark_rolling_sharpe.reset_index()
-        benchmark_rolling_sharpe_df.columns = ['Date', benchmark_symbol]
-        benchmark_rolling_sharpe_df[benchmark_symbol] = benchmark_rolling_sharpe_df[benchmark_symbol].round(2)
-        benchmark_rolling_sharpe_df['Date'] = benchmark_rolling_sharpe_df['Date'].dt.strftime('%m/%d/%Y')
+def table_rolling(context, stat, symbol, benchmark_symbol, windows):
+    """
+    Tabulates one rolling statistic of the stock, and of the benchmark if the
+    context has one, with a column per series and window and a row per date.
+    """
+    columns = {}
+    for analytics, name in [(context.stock, symbol), (context.benchmark, benchmark_symbol)]:
+        if analytics is None:
+            continue
+        rolling = analytics.rolling(windows)[stat]
+        for window in windows:
+            columns[rolling_label(name, window, windows)] = rolling[window]
+
+    # Align the columns on the dates and keep the dates any window has a value for
+    rolling_df = pd.DataFrame(columns).dropna(how='all')
+    return format_table(rolling_df, list(columns))
+
+@memoize
+def table_rolling_sharpe(stock, symbol, benchmark_symbol=None, benchmark=None, context=None, windows=(ROLLING_WINDOW,)):
+    context = ensure_context(context, stock, benchmark)
+    return table_rolling(context, 'sharpe', symbol, benchmark_symbol, windows)
+
+@memoize
+def table_rolling_sortino(stock, symbol, benchmark_symbol=None, benchmark=None, context=None, windows=(ROLLING_WINDOW,)):
+    context = ensure_context(context, stock, benchmark)
+    return table_rolling(context, 'sortino', symbol, benchmark_symbol, windows)
+
+@memoize
+def table_rolling_volatility(stock, symbol, benchmark_symbol=None, benchmark=None, context=None, windows=(ROLLING_WINDOW,)):
+    context = ensure_context(context, stock, benchmark)
+    return table_rolling(context, 'volatility', symbol, benchmark_symbol, windows)
+
+def table_rolling_benchmark(stock, symbol, benchmark, context, windows, stat):
+    """
+    Tabulates one rolling statistic of the stock against the benchmark, a
+    column per window, or returns None without a benchmark.
+    """
+    if benchmark is None:
+        return None
+    context = ensure_context(context, stock, benchmark)
+    rolling = context.benchmark_rolling(windows)[stat]
 
-        rolling_sharpe_df = rolling_sharpe_df.merge(benchmark_rolling_sharpe_df, on='Date', how='outer')
+    columns = {rolling_label(symbol, window, windows): rolling[window] for window in windows}
+    rolling_df = pd.DataFrame(columns).dropna(how='all')
+    return format_table(rolling_df, list(columns))
 
-    return rolling_sharpe_df
+@memoize
+def table_rolling_beta(stock, symbol, benchmark_symbol=None, benchmark=None, context=None, windows=(ROLLING_WINDOW,)):
+    return table_rolling_benchmark(stock, symbol, benchmark, context, windows, 'beta')
 
-def table_rolling_sortino(stock, symbol, benchmark_symbol=None, benchmark=None):
-    rolling_sortino = qs.stats.rolling_sortino(stock)
-    rolling_sortino.dropna(inplace=True)
-    rolling_sortino_df = rolling_sortino.reset_index()
-    rolling_sortino_df.columns = ['Date', symbol]
-    rolling_sortino_df[symbol] = rolling_sortino_df[symbol].round(2)
-    rolling_sortino_df['Date'] = rolling_sortino_df['Date'].dt.strftime('%m/%d/%Y')
+@memoize
+def table_rolling_alpha(stock, symbol, benchmark_symbol=None, benchmark=None, context=None, windows=(ROLLING_WINDOW,)):
+    return table_rolling_benchmark(stock, symbol, benchmark, context, windows, 'alpha')
 
-    if benchmark is not None:
-        benchmark_rolling_sortino = qs.stats.rolling_sortino(benchmark)
-        benchmark_rolling_sortino.dropna(inplace=True)
-        benchmark_rolling_sortino_df = benchmark_rolling_sortino.reset_index()
-        benchmark_rolling_sortino_df.columns = ['Date', benchmark_symbol]
-        benchmark_rolling_sortino_df[benchmark_symbol] = benchmark_rolling_sortino_df[benchmark_symbol].round(2)
-        benchmark_rolling_sortino_df['Date'] = benchmark_rolling_sortino_df['Date'].dt.strftime('%m/%d/%Y')
+@memoize
+def table_rolling_correlation(stock, symbol, benchmark_symbol=None, benchmark=None, context=None, windows=(ROLLING_WINDOW,)):
+    return table_rolling_benchmark(stock, symbol, benchmark, context, windows, 'correlation')
 
-        rolling_sortino_df = rolling_sortino_df.merge(benchmark_rolling_sortino_df, on='Date', how='outer')
+@memoize
+def table_rolling_tracking_error(stock, symbol, benchmark_symbol=None, benchmark=None, context=None, windows=(ROLLING_WINDOW,)):
+    return table_rolling_benchmark(stock, symbol, benchmark, context, windows, 'tracking error')
 
-    return rolling_sortino_df
+@memoize
+def table_yearly_returns(stock, symbol, benchmark_symbol=None, benchmark=None, context=None):
+    context = ensure_context(context, stock, benchmark)
+    return format_table(context.frame('yearly'), table_columns(context, symbol, benchmark_symbol), scale=100, date_format=None)
 
-def table_rolling_volatility(stock, symbol, benchmark_symbol=None, benchmark=None):
-    rolling_volatility = qs.stats.rolling_volatility(stock)
-    rolling_volatility.dropna(inplace=True)
-    rolling_volatility_df = rolling_volatility.reset_index()
-    rolling_volatility_df.columns = ['Date', symbol]
-    rolling_volatility_df[symbol] = rolling_volatility_df[symbol].round(2)
-    rolling_volatility_df['Date'] = rolling_volatility_df['Date'].dt.strftime('%m/%d/%Y')
+# Metrics shown as percentages in the metrics table
+PERCENTAGE_METRICS = ['CAGR', 'Max Drawdown', 'Volatility (ann.)', 'Expected Daily', 'Expected Monthly', 'Expected Yearly', 'Cumulative Return', 'Best Day', 'Worst Day', 'Best Month', 'Worst Month', 'Best Year', 'Worst Year', 'Prob. Sharpe Ratio', 'Risk of Ruin']
 
-    if benchmark is not None:
-        benchmark_rolling_volatility = qs.stats.rolling_volatility(benchmark)
-        benchmark_rolling_volatility.dropna(inplace=True)
-        benchmark_rolling_volatility_df = benchmark_rolling_volatility.reset_index()
-        benchmark_rolling_volatility_df.columns = ['Date', benchmark_symbol]
-        benchmark_rolling_volatility_df[benchmark_symbol] = benchmark_rolling_volatility_df[benchmark_symbol].round(2)
-        benchmark_rolling_volatility_df['Date'] = benchmark_rolling_volatility_df['Date'].dt.strftime('%m/%d/%Y')
-
-        rolling_volatility_df = rolling_volatility_df.merge(benchmark_rolling_volatility_df, on='Date', how='outer')
-
-    return rolling_volatility_df
+def metrics_column(metrics, column):
+    """
+    Formats computed metrics as one column of the metrics table.
 
-def table_yearly_returns(stock, symbol, benchmark_symbol=None, benchmark=None):
-    stock_yearly = stock.resample('Y').apply(lambda x: (1 + x).prod() - 1)
-    stock_yearly_df = stock_yearly.reset_index()
-    stock_yearly_df.columns = ['Date', symbol]
-    stock_yearly_df[symbol] = (stock_yearly_df[symbol] * 100).round(2)
-    stock_yearly_df['Date'] = stock_yearly_df['Date'].dt.year
+    Parameters:
+    - metrics: A dict of metric name to value, with returns as fractions.
+    - column: The name of the column.
 
-    if benchmark is not None:
-        benchmark_yearly = benchmark.resample('Y').apply(lambda x: (1 + x).prod() - 1)
-        benchmark_yearly_df = benchmark_yearly.reset_index()
-        benchmark_yearly_df.columns = ['Date', benchmark_symbol]
-        benchmark_yearly_df[benchmark_symbol] = (benchmark_yearly_df[benchmark_symbol] * 100).round(2)
-        benchmark_yearly_df['Date'] = benchmark_yearly_df['Date'].dt.year
-
-        stock_yearly_df = stock_yearly_df.merge(benchmark_yearly_df, on='Date', how='outer')
-
-    return stock_yearly_df
-
-def key_metrics(stock, symbol, benchmark_symbol, benchmark=None):
-    # Calculate additional metrics
-    stock = stock.dropna()
-    returns = qs.utils.to_returns(stock)
-    returns = qs.utils._prepare_returns(returns)
-
-    metrics = {
-            'Cumulative Return': qs.stats.comp(returns) * 100,
-            'CAGR': qs.stats.cagr(returns) * 100,
-            'Sharpe': qs.stats.sharpe(returns),
-            'Prob. Sharpe Ratio': qs.stats.probabilistic_sharpe_ratio(returns),
-            'Smart Sharpe': qs.stats.smart_sharpe(returns),
-            'Sortino': qs.stats.sortino(returns),
-            'Smart Sortino': qs.stats.smart_sortino(returns),
-            'Sortino/√2': qs.stats.sortino(returns) / np.sqrt(2),
-            'Smart Sortino/√2': qs.stats.smart_sortino(returns) / np.sqrt(2),
-            'Max Drawdown': qs.stats.max_drawdown(returns) * 100,
-            'Volatility (ann.)': qs.stats.volatility(returns) * 100,
-            'Calmar': qs.stats.calmar(returns),
-            'Skew': qs.stats.skew(returns),
-            'Kurtosis': qs.stats.kurtosis(returns),
-            'Expected Daily': qs.stats.expected_return(returns, aggregate='D') * 100,
-            'Expected Monthly': qs.stats.expected_return(returns, aggregate='M') * 100,
-            'Expected Yearly': qs.stats.expected_return(returns, aggregate='A') * 100,
-            'Best Day': qs.stats.best(returns, 'D') * 100,
-            'Worst Day': qs.stats.worst(returns, 'D') * 100,
-            'Best Month': qs.stats.best(returns, 'M') * 100,
-            'Worst Month': qs.stats.worst(returns, 'M') * 100,
-            'Recovery Factor': qs.stats.recovery_factor(returns),
-            'Ulcer Index': qs.stats.ulcer_index(returns),
-            'Worst Year': qs.stats.worst(returns, 'A') * 100,
-            'Best Year': qs.stats.best(returns, 'A') * 100,
-            'Recovery Factor': qs.stats.recovery_factor(returns),
-            'Payoff Ratio': qs.stats.payoff_ratio(returns),
-            'Profit Factor': qs.stats.profit_factor(returns),
-            'Common Sense Ratio': qs.stats.common_sense_ratio(returns),
-            'CPC Index': qs.stats.cpc_index(returns),
-            'Prob. Sharpe Ratio': qs.stats.probabilistic_sharpe_ratio(returns)*100,
-            'Risk of Ruin': qs.stats.risk_of_ruin(returns)*100,
-            'Daily Value-at-Risk': qs.stats.value_at_risk(returns),
-            'Gain/Pain Ratio': qs.stats.gain_to_pain_ratio(returns),
-            'Tail Ratio': qs.stats.tail_ratio(returns),
-            
-    }
+    Returns:
+    - A DataFrame indexed by metric, rounded to 2 decimals with '%' appended to the percentage metrics.
+    """
+    metrics_df = pd.DataFrame.from_dict(metrics, orient='index', columns=[column])
+    percentage = metrics_df.index.isin(PERCENTAGE_METRICS)
+    metrics_df.loc[percentage, column] *= 100
+    metrics_df = metrics_df.round(2).astype(object)
+    metrics_df.loc[percentage, column] = metrics_df.loc[percentage, column].astype(str) + '%'
+    return metrics_df
 
-    # Convert to DataFrame and round to 2 decimals
-    metrics_df = pd.DataFrame.from_dict(metrics, orient='index', columns=['Stock']).round(2)
+@memoize
+def key_metrics(stock, symbol, benchmark_symbol, benchmark=None, context=None, metrics=KEY_METRICS):
+    context = ensure_context(context, stock, benchmark)
 
-    # Append '%' symbol to the selected metrics
-    percentage_metrics = ['CAGR', 'Max Drawdown', 'Volatility (ann.)', 'Expected Daily', 'Expected Monthly', 'Expected Yearly', 'Cumulative Return', 'Best Day', 'Worst Day', 'Best Month', 'Worst Month', 'Best Year', 'Worst Year','Prob. Sharpe Ratio','Risk of Ruin']
-    for metric in percentage_metrics:
-        metrics_df.loc[metric, 'Stock'] = str(metrics_df.loc[metric, 'Stock']) + '%'
+    # Only the requested metrics and what they depend on are computed, once per series
+    metrics_df = metrics_column(context.stock.metrics(metrics), 'Stock')
 
-    # Repeat the same process for the benchmark if it exists
     if benchmark is not None:
-        benchmark = benchmark.dropna()
-        benchmark_returns = qs.utils._prepare_returns(benchmark)
-
-        benchmark_metrics = {
-            'CAGR': qs.stats.cagr(benchmark_returns) * 100,
-            'Sharpe': qs.stats.sharpe(benchmark_returns),
-            'Sortino': qs.stats.sortino(benchmark_returns),
-            'Max Drawdown': qs.stats.max_drawdown(benchmark_returns) * 100,
-            'Volatility (ann.)': qs.stats.volatility(benchmark_returns) * 100,
-            'Calmar': qs.stats.calmar(benchmark_returns),
-            'Expected Daily': qs.stats.expected_return(benchmark_returns, aggregate='D') * 100,
-            'Expected Monthly': qs.stats.expected_return(benchmark_returns, aggregate='M') * 100,
-            'Expected Yearly': qs.stats.expected_return(benchmark_returns, aggregate='A') * 100,
-            'Cumulative Return': qs.stats.comp(benchmark_returns) * 100,
-            'Prob. Sharpe Ratio': qs.stats.probabilistic_sharpe_ratio(benchmark_returns)*100,
-            'Smart Sharpe': qs.stats.smart_sharpe(benchmark_returns),
-            'Smart Sortino': qs.stats.smart_sortino(benchmark_returns),
-            'Sortino/√2': qs.stats.sortino(benchmark_returns) / np.sqrt(2),
-            'Smart Sortino/√2': qs.stats.smart_sortino(benchmark_returns) / np.sqrt(2),
-            'Skew': qs.stats.skew(benchmark_returns),
-            'Kurtosis': qs.stats.kurtosis(benchmark_returns),
-            'Daily Value-at-Risk': qs.stats.value_at_risk(benchmark_returns),
-            'Gain/Pain Ratio': qs.stats.gain_to_pain_ratio(benchmark_returns),
-            'Tail Ratio': qs.stats.tail_ratio(benchmark_returns),
-            'Best Day': qs.stats.best(benchmark_returns, 'D') * 100,
-            'Worst Day': qs.stats.worst(benchmark_returns, 'D') * 100,
-            'Best Month': qs.stats.best(benchmark_returns, 'M') * 100,
-            'Worst Month': qs.stats.worst(benchmark_returns, 'M') * 100,
-            'Recovery Factor': qs.stats.recovery_factor(benchmark_returns),
-            'Ulcer Index': qs.stats.ulcer_index(benchmark_returns),
-            'Worst Year': qs.stats.worst(benchmark_returns, 'A') * 100,
-            'Best Year': qs.stats.best(benchmark_returns, 'A') * 100,
-            'Recovery Factor': qs.stats.recovery_factor(benchmark_returns),
-            'Payoff Ratio': qs.stats.payoff_ratio(benchmark_returns),
-            'Profit Factor': qs.stats.profit_factor(benchmark_returns),
-            'CPC Index': qs.stats.cpc_index(benchmark_returns),
-            'Risk of Ruin': qs.stats.risk_of_ruin(benchmark_returns),
-            'Common Sense Ratio': qs.stats.common_sense_ratio(benchmark_returns),
-        }
-
-        metrics.update(benchmark_metrics)
-
-        # Convert to DataFrame and round to 2 decimals
-        benchmark_metrics_df = pd.DataFrame.from_dict(benchmark_metrics, orient='index', columns=['Benchmark']).round(2)
-
-        # Append '%' symbol to the selected metrics
-        for metric in percentage_metrics:
-            benchmark_metrics_df.loc[metric, 'Benchmark'] = str(benchmark_metrics_df.loc[metric, 'Benchmark']) + '%'
+        benchmark_metrics_df = metrics_column(context.benchmark.metrics(metrics), 'Benchmark')
 
         # Join the two dataframes
         metrics_df = metrics_df.reset_index().merge(benchmark_metrics_df.reset_index(), left_on='index', right_on='index', how='outer')
@@ -1049,4 +906,4 @@ def key_metrics(stock, symbol, benchmark_symbol, benchmark=None):
         metrics_df.reset_index(inplace=True)
         metrics_df.columns = ['Metric', symbol]
 
-    return metrics_df
\ No newline at end of file
+    return metrics_df
@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+
+# Sustained provider calls per second and how many may be made back to back
+PROVIDER_RATE = float(os.environ.get('MM_PROVIDER_RATE', 2))
+PROVIDER_BURST = int(os.environ.get('MM_PROVIDER_BURST', 5))
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Each call
+    takes one token and only sleeps when the bucket is empty, so calls under
+    the limit go through without delay.
+
+    Parameters:
+    - rate: Tokens added per second.
+    - capacity: Maximum number of tokens, i.e. the allowed burst.
+    """
+
+    def __init__(self, rate=PROVIDER_RATE, capacity=PROVIDER_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token, blocking until one is available.
+
+        Returns:
+        - The number of seconds the caller was delayed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            # Reserve the token now, going negative queues later callers behind us
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+# Limiter shared by every call to the data provider in this process
+provider_limiter = TokenBucket()
@@ -0,0 +1,49 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from modules.memo import figure_html
+
+# Graphs and tables of one report computed at the same time
+RENDER_WORKERS = int(os.environ.get('MM_RENDER_WORKERS', 4))
+
+def _render(function, stock, graph):
+    result = function(stock)
+    # Export HTML of the graphs is built in the worker too
+    html = figure_html(result) if graph and result is not None else None
+    return result, html
+
+def render_options(options, graph_functions, table_functions, stock):
+    """
+    Computes the selected graphs and tables concurrently and yields them in
+    the order they were selected.
+
+    Everything is submitted up front to a pool of this call's own, so while
+    the first results are being displayed the next ones are still computing,
+    and one session's report never waits behind another's.
+
+    Parameters:
+    - options: The selected option names, in display order.
+    - graph_functions: A dict of option name to a function of the stock
+      returning a figure.
+    - table_functions: A dict of option name to a function of the stock
+      returning a DataFrame.
+    - stock: The returns passed to every function.
+
+    Returns:
+    - An iterator of (option, result, html) tuples, html being the figure's
+      HTML for graphs and None for tables. Options without a function are
+      skipped, and an option whose function raised re-raises when reached.
+    """
+    selected = [option for option in options if option in graph_functions or option in table_functions]
+    if not selected:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(RENDER_WORKERS, len(selected)), thread_name_prefix='render') as executor:
+        futures = []
+        for option in selected:
+            graph = option in graph_functions
+            function = graph_functions[option] if graph else table_functions[option]
+            futures.append((option, executor.submit(_render, function, stock, graph)))
+
+        for option, future in futures:
+            result, html = future.result()
+            yield option, result, html
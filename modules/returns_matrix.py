@@ -0,0 +1,200 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+try:
+    import fcntl
+except ImportError:
+    # Windows, where builds aren't locked against each other
+    fcntl = None
+from modules.date_index import day_bounds, epoch_days
+from modules.returns_store import returns_store
+
+# Directory holding the packed returns matrix
+MATRIX_DIR = os.environ.get('MM_RETURNS_MATRIX', os.path.join('data', 'matrix'))
+
+META_FILE = 'matrix.json'
+
+LOCK_FILE = 'matrix.lock'
+
+@contextlib.contextmanager
+def _build_lock(directory):
+    # One build at a time per directory, across processes
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'w') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def build_matrix(store=returns_store, symbols=None, directory=MATRIX_DIR, dtype=np.float64):
+    """
+    Packs the daily returns of every stored symbol into one date-aligned array.
+
+    The matrix is written as a .npy file of shape (dates, symbols) so it can be
+    memory-mapped, with NaN where a symbol has no data. Files of a new build
+    get their own names and the metadata file is replaced last, so processes
+    reading the previous build are never affected. Concurrent builds of the
+    same directory wait for each other.
+
+    Parameters:
+    - store: The ReturnsStore to read the returns from.
+    - symbols: The symbols to include, every stored symbol if None.
+    - directory: Where the matrix is written.
+    - dtype: np.float64, or np.float32 to halve the size.
+
+    Returns:
+    - The path of the metadata file.
+    """
+    if symbols is None:
+        symbols = sorted(os.path.basename(path)[:-len('.parquet')] for path in glob.glob(os.path.join(store.root, '*.parquet')))
+    series = {symbol.upper(): store.read(symbol) for symbol in symbols}
+    series = {symbol: returns for symbol, returns in series.items() if returns is not None and not returns.empty}
+    symbols = list(series)
+
+    with _build_lock(directory):
+        # The rows are the union of every trading calendar
+        dates = pd.DatetimeIndex([])
+        for returns in series.values():
+            dates = dates.union(returns.index)
+        days = epoch_days(dates)
+
+        build = str(time.time_ns())
+        values_file = f'returns-{build}.npy'
+        dates_file = f'dates-{build}.npy'
+
+        values = np.lib.format.open_memmap(os.path.join(directory, values_file), mode='w+', dtype=dtype, shape=(len(days), len(symbols)))
+        values[:] = np.nan
+        bounds = {}
+        for column, (symbol, returns) in enumerate(series.items()):
+            rows = np.searchsorted(days, epoch_days(returns.index))
+            values[rows, column] = returns.to_numpy()
+            bounds[symbol] = [int(rows[0]), int(rows[-1]) + 1]
+        values.flush()
+        del values
+        np.save(os.path.join(directory, dates_file), days)
+
+        meta = {
+            'build': build,
+            'built_at': time.time(),
+            'values': values_file,
+            'dates': dates_file,
+            'symbols': symbols,
+            'bounds': bounds,
+        }
+        meta_path = os.path.join(directory, META_FILE)
+        tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+        # Older builds can go, processes that still map them keep their pages, and
+        # no other build is being written while we hold the lock
+        for path in glob.glob(os.path.join(directory, '*.npy')):
+            if build not in os.path.basename(path):
+                os.remove(path)
+
+        return meta_path
+
+class ReturnsMatrix:
+    """
+    Read-only, memory-mapped view of a matrix written by build_matrix.
+
+    Lookups and date range slices return views on the mapped file, so every
+    process reading the matrix shares the same pages through the OS page cache.
+
+    Parameters:
+    - directory: Where the matrix was written.
+    """
+
+    def __init__(self, directory=MATRIX_DIR):
+        meta_path = os.path.join(directory, META_FILE)
+        self.meta_mtime = os.path.getmtime(meta_path)
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+        self.build = meta['build']
+        self.built_at = meta['built_at']
+        self.symbols = meta['symbols']
+        self.bounds = meta['bounds']
+        self.values = np.load(os.path.join(directory, meta['values']), mmap_mode='r')
+        self.days = np.load(os.path.join(directory, meta['dates']), mmap_mode='r')
+        self.dates = pd.to_datetime(np.asarray(self.days), unit='D').rename('Date')
+        self._columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    def __contains__(self, symbol):
+        return symbol.upper() in self._columns
+
+    def rows(self, start=None, end=None):
+        """
+        Returns the row range covering start to end, both inclusive.
+        """
+        return day_bounds(self.days, start, end)
+
+    def column(self, symbol, start=None, end=None):
+        """
+        Returns the returns of a symbol between two dates as a zero-copy view.
+        """
+        first, last = self.rows(start, end)
+        return self.values[first:last, self._columns[symbol.upper()]]
+
+    def series(self, symbol, start=None, end=None):
+        """
+        Returns the returns of a symbol as a pandas Series backed by the mapped
+        file, limited to the dates the symbol has data for.
+        """
+        symbol = symbol.upper()
+        first, last = self.rows(start, end)
+        low, high = self.bounds[symbol]
+        first, last = max(first, low), min(last, high)
+        column = self.values[first:last, self._columns[symbol]]
+        return pd.Series(column, index=self.dates[first:last], name=symbol, copy=False)
+
+    def frame(self, symbols=None, start=None, end=None):
+        """
+        Returns a dates x symbols DataFrame of returns between two dates.
+        """
+        first, last = self.rows(start, end)
+        if symbols is None:
+            values, symbols = self.values[first:last], self.symbols
+        else:
+            symbols = [symbol.upper() for symbol in symbols]
+            values = self.values[first:last, [self._columns[symbol] for symbol in symbols]]
+        return pd.DataFrame(values, index=self.dates[first:last], columns=symbols, copy=False)
+
+_matrix = None
+
+def open_matrix(directory=MATRIX_DIR):
+    """
+    Returns the current ReturnsMatrix of the process, reopening it when a newer
+    build has been written, or None if no matrix has been built.
+    """
+    global _matrix
+    meta_path = os.path.join(directory, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    if _matrix is None or _matrix.meta_mtime != os.path.getmtime(meta_path):
+        try:
+            _matrix = ReturnsMatrix(directory)
+        except OSError:
+            # A new build replaced the files while we were opening them
+            pass
+    return _matrix
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pack the stored daily returns into a memory-mappable matrix.')
+    parser.add_argument('symbols', nargs='*', help='symbols to include, every stored symbol by default')
+    parser.add_argument('--float32', action='store_true', help='store float32 instead of float64')
+    parser.add_argument('--directory', default=MATRIX_DIR)
+    args = parser.parse_args()
+
+    path = build_matrix(symbols=args.symbols or None, directory=args.directory, dtype=np.float32 if args.float32 else np.float64)
+    print(f'Wrote {path}')
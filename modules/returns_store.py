@@ -0,0 +1,164 @@
+import json
+import os
+import re
+import time
+import pandas as pd
+import quantstats as qs
+from modules.online_metrics import OnlineMetrics
+
+# Parquet support is optional, without it returns are downloaded on every load
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+# Directory holding one Parquet file of daily returns per symbol
+STORE_DIR = os.environ.get('MM_RETURNS_STORE', os.path.join('data', 'returns'))
+
+# Seconds a stored file is trusted before we ask the provider for newer days
+MAX_AGE = int(os.environ.get('MM_RETURNS_MAX_AGE', 60 * 60))
+
+# Ticker symbols we accept, also keeps user input from reaching paths outside the store
+SYMBOL_PATTERN = re.compile(r'^[A-Z0-9.^=-]{1,15}$')
+
+def check_symbol(symbol):
+    """
+    Raises a ValueError unless symbol looks like a ticker symbol.
+    """
+    if not isinstance(symbol, str) or not SYMBOL_PATTERN.match(symbol.upper()):
+        raise ValueError(f"Invalid ticker symbol '{symbol}'")
+
+class ReturnsStore:
+    """
+    Persistent on-disk store of daily returns, one Parquet file per symbol.
+
+    The first request for a symbol downloads its full history. Later requests
+    read the file and only fetch the days after the last stored date.
+
+    Parameters:
+    - root: The directory the Parquet files are written to.
+    - max_age: Seconds a file is considered fresh before it is topped up.
+    """
+
+    def __init__(self, root=STORE_DIR, max_age=MAX_AGE):
+        self.root = root
+        self.max_age = max_age
+
+    def path(self, symbol):
+        check_symbol(symbol)
+        return os.path.join(self.root, f'{symbol.upper()}.parquet')
+
+    def read(self, symbol):
+        """
+        Returns the stored returns for a symbol, or None if nothing is stored.
+        """
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return None
+
+        returns = pd.read_parquet(path)[symbol.upper()]
+        returns.index.name = 'Date'
+        return returns
+
+    def write(self, symbol, returns):
+        """
+        Writes the returns for a symbol, replacing any stored file atomically
+        so readers in other processes never see a half written file.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(symbol)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        returns.rename(symbol.upper()).to_frame().to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    def state_path(self, symbol):
+        check_symbol(symbol)
+        return os.path.join(self.root, f'{symbol.upper()}.state.json')
+
+    def read_state(self, symbol):
+        """
+        Returns the online metrics accumulators saved with a symbol's returns,
+        or None if there are none.
+        """
+        path = self.state_path(symbol)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return OnlineMetrics.from_dict(json.load(f))
+
+    def write_state(self, symbol, state):
+        """
+        Saves the online metrics accumulators of a symbol, atomically like write.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = self.state_path(symbol)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def update_state(self, symbol, returns):
+        """
+        Advances the saved accumulators of a symbol over newly stored days,
+        in O(1) per day, building them from the series the first time.
+        """
+        state = self.read_state(symbol) or OnlineMetrics()
+        self.write_state(symbol, state.advance(returns))
+
+    def is_fresh(self, symbol):
+        path = self.path(symbol)
+        return os.path.exists(path) and time.time() - os.path.getmtime(path) < self.max_age
+
+    def update(self, symbol, download=qs.utils.download_returns):
+        """
+        Loads the returns for a symbol, fetching only the days missing on disk.
+
+        Parameters:
+        - symbol: The ticker symbol.
+        - download: A callable with the signature of qs.utils.download_returns.
+
+        Returns:
+        - A pandas Series of daily returns indexed by date.
+        """
+        stored = self.read(symbol)
+
+        # Nothing on disk yet, download the whole history once
+        if stored is None or len(stored) < 2:
+            returns = download(symbol).rename(symbol.upper())
+            if not returns.empty:
+                self.write(symbol, returns)
+                self.update_state(symbol, returns)
+            return returns
+
+        if self.is_fresh(symbol):
+            return stored
+
+        # Start the download one row before the last stored date. The first
+        # downloaded row has no previous close and comes back as 0, and the
+        # last stored row may be a partial intraday bar, so both are replaced.
+        last_date = stored.index[-1]
+        new = download(symbol, period=pd.DatetimeIndex([stored.index[-2]]))
+        new = new[new.index >= last_date].rename(symbol.upper())
+
+        if new.empty:
+            # Touch the file so we don't ask again until it goes stale
+            os.utime(self.path(symbol))
+            return stored
+
+        returns = pd.concat([stored[stored.index < last_date], new])
+        self.write(symbol, returns)
+        self.update_state(symbol, returns)
+        return returns
+
+# Store shared by the app
+returns_store = ReturnsStore()
+
+def load_returns(symbol, download=qs.utils.download_returns):
+    """
+    Loads the daily returns for a symbol through the on-disk store, falling back
+    to a plain download when Parquet support is not installed.
+    """
+    if not HAS_PARQUET:
+        return download(symbol)
+    return returns_store.update(symbol, download)
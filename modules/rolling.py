@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+# Default window, quantstats' 6 months of trading days
+ROLLING_WINDOW = 126
+
+# Windows offered in the report, in trading days
+ROLLING_WINDOWS = {
+    '1 month': 21,
+    '3 months': 63,
+    '6 months': 126,
+    '1 year': 252,
+}
+
+# Trading days per year used to annualize, as in quantstats
+PERIODS_PER_YEAR = 252
+
+# Statistics returned by rolling_stats
+ROLLING_STATS = ['mean', 'std', 'downside', 'sharpe', 'sortino', 'volatility']
+
+def _prefix(values):
+    # Cumulative sums with a leading 0, so window sums are one subtraction
+    prefix = np.zeros(len(values) + 1)
+    np.cumsum(values, out=prefix[1:])
+    return prefix
+
+def prefix_sums(returns):
+    """
+    Returns the prefix sums every rolling window of a returns series is
+    computed from.
+
+    The returns are shifted by their mean before summing, which keeps the
+    variances of the windows accurate over long histories.
+
+    Parameters:
+    - returns: A pandas Series of daily returns.
+
+    Returns:
+    - A dict of numpy arrays, one more element long than the series.
+    """
+    values = returns.to_numpy(dtype=float)
+    observed = np.isfinite(values)
+    shift = values[observed].mean() if observed.any() else 0.0
+    centered = np.where(observed, values - shift, 0.0)
+    losses = np.where(observed & (values < 0), values, 0.0)
+    return {
+        'index': returns.index,
+        'shift': shift,
+        'count': _prefix(observed),
+        'sum': _prefix(centered),
+        'squares': _prefix(centered * centered),
+        'downside': _prefix(losses * losses),
+    }
+
+def rolling_stats(sums, windows=(ROLLING_WINDOW,)):
+    """
+    Computes rolling statistics of a returns series for several window
+    lengths at once, in O(n) per window.
+
+    Every window sum is the difference of two prefix sums, computed for all
+    dates and windows in one broadcast operation. The statistics follow
+    quantstats: the std has one degree of freedom, the downside deviation
+    divides the squared losses by the window length, and a window with a
+    missing return has no value.
+
+    Parameters:
+    - sums: The prefix sums of the series, from prefix_sums.
+    - windows: The window lengths in trading days.
+
+    Returns:
+    - A DataFrame indexed by date with (statistic, window) columns for the
+      statistics of ROLLING_STATS, the ratios and volatility annualized.
+    """
+    windows = np.asarray(windows, dtype=int)
+    end = np.arange(1, len(sums['index']) + 1)[:, None]
+    start = np.maximum(end - windows, 0)
+    full = (end >= windows) & (sums['count'][end] - sums['count'][start] == windows)
+
+    def window_sum(prefix):
+        return np.where(full, prefix[end] - prefix[start], np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total = window_sum(sums['sum'])
+        mean = total / windows + sums['shift']
+        variance = (window_sum(sums['squares']) - total * total / windows) / (windows - 1)
+        std = np.sqrt(np.maximum(variance, 0.0))
+        downside = np.sqrt(window_sum(sums['downside']) / windows)
+        annualize = np.sqrt(PERIODS_PER_YEAR)
+        stats = [mean, std, downside, mean / std * annualize, mean / downside * annualize, std * annualize]
+
+    columns = pd.MultiIndex.from_product([ROLLING_STATS, windows.tolist()])
+    return pd.DataFrame(np.hstack(stats), index=sums['index'], columns=columns)
+
+# Statistics returned by rolling_benchmark_stats
+BENCHMARK_STATS = ['beta', 'alpha', 'correlation', 'tracking error']
+
+def rolling_benchmark_stats(returns, benchmark, windows=(ROLLING_WINDOW,)):
+    """
+    Computes rolling beta, alpha, correlation and tracking error against a
+    benchmark for several window lengths, in O(n) per window.
+
+    The covariances come from prefix sums of the products of the mean-shifted
+    returns, so a whole universe is handled at once by passing a dates x
+    symbols DataFrame: every symbol is one more column of the same array
+    operations. A window missing a return of either side has no value.
+
+    Parameters:
+    - returns: A pandas Series of daily returns, or a DataFrame with one column
+      per symbol, on the same dates as the benchmark.
+    - benchmark: A pandas Series of the benchmark's daily returns.
+    - windows: The window lengths in trading days.
+
+    Returns:
+    - A DataFrame indexed by date with (statistic, window) columns for the
+      statistics of BENCHMARK_STATS, or (statistic, window, symbol) columns for
+      a DataFrame of returns. Alpha and tracking error are annualized.
+    """
+    frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+    x = frame.to_numpy(dtype=float)
+    y = benchmark.to_numpy(dtype=float)[:, None]
+
+    # Only dates with both returns count, shifted by their means for accuracy
+    paired = np.isfinite(x) & np.isfinite(y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_shift = np.nanmean(np.where(paired, x, np.nan), axis=0)
+        y_shift = np.nanmean(np.where(paired, y, np.nan), axis=0)
+    x_centered = np.where(paired, x - x_shift, 0.0)
+    y_centered = np.where(paired, y - y_shift, 0.0)
+
+    def prefix(values):
+        sums = np.zeros((len(values) + 1, values.shape[1]))
+        np.cumsum(values, axis=0, out=sums[1:])
+        return sums
+
+    sums = {
+        'count': prefix(paired),
+        'x': prefix(x_centered),
+        'y': prefix(y_centered),
+        'xx': prefix(x_centered * x_centered),
+        'yy': prefix(y_centered * y_centered),
+        'xy': prefix(x_centered * y_centered),
+    }
+
+    end = np.arange(1, len(x) + 1)
+    annualize = np.sqrt(PERIODS_PER_YEAR)
+    stats = {stat: [] for stat in BENCHMARK_STATS}
+    for window in windows:
+        start = np.maximum(end - window, 0)
+        full = (end >= window)[:, None] & (sums['count'][end] - sums['count'][start] == window)
+
+        def window_sum(name):
+            return np.where(full, sums[name][end] - sums[name][start], np.nan)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sum_x, sum_y = window_sum('x'), window_sum('y')
+            var_x = (window_sum('xx') - sum_x * sum_x / window) / (window - 1)
+            var_y = (window_sum('yy') - sum_y * sum_y / window) / (window - 1)
+            cov = (window_sum('xy') - sum_x * sum_y / window) / (window - 1)
+            var_x, var_y = np.maximum(var_x, 0.0), np.maximum(var_y, 0.0)
+
+            beta = np.where(var_y > 0, cov / var_y, np.nan)
+            mean_x, mean_y = sum_x / window + x_shift, sum_y / window + y_shift
+            stats['beta'].append(beta)
+            stats['alpha'].append((mean_x - beta * mean_y) * PERIODS_PER_YEAR)
+            stats['correlation'].append(cov / np.sqrt(var_x * var_y))
+            stats['tracking error'].append(np.sqrt(np.maximum(var_x + var_y - 2 * cov, 0.0)) * annualize)
+
+    windows = list(windows)
+    if isinstance(returns, pd.Series):
+        columns = pd.MultiIndex.from_product([BENCHMARK_STATS, windows])
+    else:
+        columns = pd.MultiIndex.from_product([BENCHMARK_STATS, windows, frame.columns])
+    data = np.hstack([block for stat in BENCHMARK_STATS for block in stats[stat]])
+    return pd.DataFrame(data, index=frame.index, columns=columns)
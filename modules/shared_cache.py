@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Default lifetime of a cached entry in seconds
+CACHE_TTL = int(os.environ.get('MM_CACHE_TTL', 15 * 60))
+
+# Default memory budget of the returns cache in bytes
+CACHE_MAX_BYTES = int(os.environ.get('MM_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+def sizeof(value):
+    """
+    Returns the approximate memory footprint of a cached value in bytes.
+    """
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    return sys.getsizeof(value)
+
+class TTLCache:
+    """
+    Thread-safe cache shared by every session of the process.
+
+    Entries expire after a time to live, and the least recently used entries
+    are evicted once the total size goes over the memory budget.
+
+    Parameters:
+    - ttl: Seconds an entry stays valid, None to never expire.
+    - max_bytes: Total size budget of all entries.
+    - sizeof: A callable returning the size of a value in bytes.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, sizeof=sizeof):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            value, size, expires = entry
+            if expires is not None and expires < time.monotonic():
+                self._remove(key)
+                return default
+
+            # Mark the entry as most recently used
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # Values bigger than the whole budget are never cached
+            if size > self.max_bytes:
+                return value
+
+            self._entries[key] = (value, size, expires)
+            self.total_bytes += size
+
+            # Evict the least recently used entries until we fit the budget
+            while self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+        return value
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+# Daily returns keyed by symbol, shared by all Streamlit sessions
+returns_cache = TTLCache()
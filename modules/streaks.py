@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+# Streak kinds by the sign of their returns
+KINDS = {1: 'win', -1: 'loss'}
+
+def _signs(values):
+    # 1 for gains, -1 for losses, 0 for flat or missing days, which end a streak
+    return (values > 0).astype(np.int8) - (values < 0).astype(np.int8)
+
+def run_lengths(values):
+    """
+    Run-length encodes the win/loss signs of every column of a returns array.
+
+    The columns are laid end to end and a run starts wherever the sign
+    changes or a new column begins, so all the streaks of all the columns
+    come out of one pass over the array.
+
+    Parameters:
+    - values: A numpy array of daily returns, dates x symbols.
+
+    Returns:
+    - A tuple of arrays (column, start row, length, sign) with one element per
+      streak, in column then date order. Flat days aren't streaks.
+    """
+    rows, _ = values.shape
+    signs = _signs(values).T.ravel()
+    if len(signs) == 0:
+        empty = np.array([], dtype=int)
+        return empty, empty, empty, empty
+
+    boundary = np.empty(len(signs), dtype=bool)
+    boundary[0] = True
+    np.not_equal(signs[1:], signs[:-1], out=boundary[1:])
+    boundary[::rows] = True
+
+    starts = np.flatnonzero(boundary)
+    lengths = np.diff(np.append(starts, len(signs)))
+    run_signs = signs[starts]
+    streak = run_signs != 0
+    starts = starts[streak]
+    return starts // rows, starts % rows, lengths[streak], run_signs[streak].astype(int)
+
+def streaks(returns):
+    """
+    Lists every win and loss streak of a returns series.
+
+    Parameters:
+    - returns: A pandas Series of daily returns.
+
+    Returns:
+    - A pandas DataFrame with one row per streak in date order and the columns
+      'kind' ('win' or 'loss'), 'start', 'end', 'days' (trading days) and
+      'return' (compounded over the streak).
+    """
+    values = returns.to_numpy(dtype=float)
+    _, start, length, sign = run_lengths(values[:, None])
+    end = start + length - 1
+
+    # Compounded return of each streak from the prefix sums of the log growth
+    growth = np.zeros(len(values) + 1)
+    np.cumsum(np.log1p(np.nan_to_num(values)), out=growth[1:])
+
+    return pd.DataFrame({
+        'kind': pd.Categorical.from_codes((sign < 0).astype(int), ['win', 'loss']),
+        'start': returns.index[start],
+        'end': returns.index[end],
+        'days': length,
+        'return': np.expm1(growth[end + 1] - growth[start]),
+    })
+
+def streak_summary(returns):
+    """
+    Summarizes the win and loss streaks of a returns series.
+
+    Returns:
+    - A dict with a 'win' and a 'loss' entry, each a dict with the 'longest'
+      streak length, its 'start' and 'end' dates (the first one on ties), the
+      'average' length, the streak 'count' and the 'distribution' of lengths
+      as a Series of streak counts indexed by length.
+    """
+    runs = streaks(returns)
+    summary = {}
+    for kind in KINDS.values():
+        kind_runs = runs[runs['kind'] == kind]
+        longest = kind_runs.loc[kind_runs['days'].idxmax()] if len(kind_runs) else None
+        summary[kind] = {
+            'longest': int(longest['days']) if longest is not None else 0,
+            'start': longest['start'] if longest is not None else None,
+            'end': longest['end'] if longest is not None else None,
+            'average': kind_runs['days'].mean() if len(kind_runs) else 0.0,
+            'count': len(kind_runs),
+            'distribution': kind_runs['days'].value_counts().sort_index().rename('streaks'),
+        }
+    return summary
+
+def streak_arrays(values):
+    """
+    Computes the streak statistics of every column of a returns array with
+    grouped reductions, without a loop over the columns.
+
+    Returns:
+    - A dict of arrays with one element per column: for each kind ('win' and
+      'loss'), '<kind> longest', '<kind> longest start' (the row the first
+      longest streak starts on, -1 without streaks), '<kind> average' and
+      '<kind> count'.
+    """
+    columns = values.shape[1]
+    column, start, length, sign = run_lengths(values)
+    stats = {}
+    for code, kind in KINDS.items():
+        selected = sign == code
+        kind_column, kind_start, kind_length = column[selected], start[selected], length[selected]
+
+        # The streaks are sorted by column, so each column's streaks are one segment
+        count = np.bincount(kind_column, minlength=columns)
+        offsets = np.searchsorted(kind_column, np.arange(columns))
+        present = count > 0
+        longest = np.zeros(columns, dtype=int)
+        longest_start = np.full(columns, -1)
+        if len(kind_length):
+            longest[present] = np.maximum.reduceat(kind_length, offsets[present])
+
+            # First streak of the longest length in every column
+            is_longest = kind_length == longest[kind_column]
+            first = np.searchsorted(kind_column[is_longest], np.flatnonzero(present))
+            longest_start[present] = kind_start[is_longest][first]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            average = np.bincount(kind_column, weights=kind_length, minlength=columns) / count
+
+        stats[f'{kind} longest'] = longest
+        stats[f'{kind} longest start'] = longest_start
+        stats[f'{kind} average'] = np.where(count > 0, average, 0.0)
+        stats[f'{kind} count'] = count
+    return stats
+
+def streak_stats(returns):
+    """
+    Computes the streak statistics of many symbols at once.
+
+    Parameters:
+    - returns: A dates x symbols DataFrame of daily returns, NaN where a symbol
+      has no data (e.g. ReturnsMatrix.frame()).
+
+    Returns:
+    - A symbols x statistics DataFrame with the longest win and loss streak,
+      the date it starts on, the average streak length and the number of
+      streaks.
+    """
+    stats = streak_arrays(returns.to_numpy(dtype=float))
+    for kind in KINDS.values():
+        rows = stats[f'{kind} longest start']
+        stats[f'{kind} longest start'] = returns.index[np.maximum(rows, 0)].where(rows >= 0)
+    return pd.DataFrame(stats, index=returns.columns).rename_axis('Symbol')